@@ -2,17 +2,30 @@
 报销系统主应用 - Flask后端
 简洁的报销申请和审批系统
 """
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, send_file
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory, send_file, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import os
 import uuid
+import json
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps, lru_cache
+from operator import attrgetter
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 # 新增：导出依赖
 from openpyxl import Workbook
 from io import BytesIO
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, or_, select, update, insert, delete, text, table, column, literal_column, func, case
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
 # 报表导出依赖
 from PIL import Image
 import xlsxwriter
@@ -35,10 +48,37 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-# 数据库配置
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "expense_system.db")}'
+# 数据库配置（可通过 DATABASE_URL 环境变量覆盖，脚本和检查工具用它指向临时库）
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(basedir, "expense_system.db")}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# 业务时区："今日统计"按该时区的自然日计算（数据库中的时间均为 UTC）
+app.config['BUSINESS_TIMEZONE'] = os.environ.get('BUSINESS_TIMEZONE', 'Asia/Shanghai')
+
+# 统计接口进程内缓存：最多条目数和过期秒数
+app.config['STATS_CACHE_SIZE'] = int(os.environ.get('STATS_CACHE_SIZE', 512))
+app.config['STATS_CACHE_TTL'] = int(os.environ.get('STATS_CACHE_TTL', 30))
+
+# 仪表板趋势图 HTML 缓存：最多条目数（每个作用域每个窗口一条，单条约 8-18 KB）和过期秒数
+app.config['TREND_CHART_CACHE_SIZE'] = int(os.environ.get('TREND_CHART_CACHE_SIZE', 256))
+app.config['TREND_CHART_CACHE_TTL'] = int(os.environ.get('TREND_CHART_CACHE_TTL', 600))
+
+# 通知推送（SSE）：心跳间隔、每个进程轮询数据版本（发现其他进程写入）的间隔和单个连接的最长保持时间（秒），到期后浏览器自动重连
+app.config['NOTIFICATION_STREAM_HEARTBEAT'] = int(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT', 15))
+app.config['NOTIFICATION_STREAM_POLL'] = int(os.environ.get('NOTIFICATION_STREAM_POLL', 5))
+app.config['NOTIFICATION_STREAM_MAX_AGE'] = int(os.environ.get('NOTIFICATION_STREAM_MAX_AGE', 300))
+
+# 通知保留策略：已读超过 N 小时删除、每个用户最多保留 N 条、超过 N 天一律删除（0 表示不启用该条）
+# 后台清理每 NOTIFICATION_RETENTION_INTERVAL 秒运行一次（0 表示不启动），每批最多删除 BATCH 条
+app.config['NOTIFICATION_RETENTION_READ_HOURS'] = int(os.environ.get('NOTIFICATION_RETENTION_READ_HOURS', 1))
+app.config['NOTIFICATION_RETENTION_MAX_PER_USER'] = int(os.environ.get('NOTIFICATION_RETENTION_MAX_PER_USER', 500))
+app.config['NOTIFICATION_RETENTION_MAX_AGE_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_MAX_AGE_DAYS', 180))
+app.config['NOTIFICATION_RETENTION_INTERVAL'] = int(os.environ.get('NOTIFICATION_RETENTION_INTERVAL', 600))
+app.config['NOTIFICATION_RETENTION_BATCH'] = int(os.environ.get('NOTIFICATION_RETENTION_BATCH', 500))
+
+# 管理员统计快照的后台刷新间隔（秒），0 表示不启动后台线程、读取时按需计算
+app.config['ADMIN_STATS_REFRESH_INTERVAL'] = int(os.environ.get('ADMIN_STATS_REFRESH_INTERVAL', 60))
+
 db = SQLAlchemy(app)
 
 # 文件上传辅助函数
@@ -85,6 +125,29 @@ class Notification(db.Model):
     # 关系
     user = db.relationship('User', backref=db.backref('notifications', lazy=True))
     related_expense = db.relationship('Expense', backref=db.backref('notifications', lazy=True))
+    
+    # 索引：未读数/未读列表、按时间倒序的通知列表、删除报销时按关联报销清理
+    __table_args__ = (
+        db.Index('ix_notification_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_related_expense', 'related_expense_id'),
+    )
+
+class NotificationCounter(db.Model):
+    """用户未读通知数（冗余计数）
+    
+    与通知的创建、已读标记、删除在同一事务中增减，读取未读数只需一次主键查询。
+    计数出现偏差时用 scripts/reconcile_unread_counts.py 按通知表修复。
+    """
+    __tablename__ = 'notification_counter'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+
+class ScheduledJob(db.Model):
+    """后台定时任务的最近运行时间：各 worker 用条件更新抢占，同一周期只有一个 worker 执行"""
+    __tablename__ = 'scheduled_job'
+    name = db.Column(db.String(50), primary_key=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
 
 class Currency(db.Model):
     """货币模型"""
@@ -134,6 +197,12 @@ class ExpenseFile(db.Model):
     file_type = db.Column(db.String(50), nullable=False)
     expense_id = db.Column(db.Integer, db.ForeignKey('expense.id'), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # 索引：按报销加载附件、按存储文件名查找（uploaded_file）
+    __table_args__ = (
+        db.Index('ix_expense_file_expense_id', 'expense_id'),
+        db.Index('ix_expense_file_filename', 'filename'),
+    )
 
 class Expense(db.Model):
     """报销记录模型"""
@@ -160,6 +229,320 @@ class Expense(db.Model):
     
     # 新增关系：附件
     files = db.relationship('ExpenseFile', backref='expense', lazy=True, cascade='all, delete-orphan')
+    
+    # 索引：按用户/状态筛选并按创建时间倒序的列表和统计，按报销日期、美元金额的区间查询，以及按审批时间的今日统计
+    __table_args__ = (
+        db.Index('ix_expense_user_status_created', 'user_id', 'status', 'created_at'),
+        db.Index('ix_expense_user_created', 'user_id', 'created_at'),
+        db.Index('ix_expense_status_created', 'status', 'created_at'),
+        db.Index('ix_expense_created', 'created_at'),
+        db.Index('ix_expense_expense_date', 'expense_date'),
+        db.Index('ix_expense_user_expense_date', 'user_id', 'expense_date'),
+        db.Index('ix_expense_usd_amount', 'usd_amount'),
+        db.Index('ix_expense_status_approved', 'status', 'approved_at'),
+    )
+
+class DataVersion(db.Model):
+    """数据版本计数器：每个用户一个（user:<id>），管理员视图共用一个（global），只增不减"""
+    scope = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ExpenseDailyRollup(db.Model):
+    """报销日汇总：按 报销日期 × 用户 × 状态 × 货币 × 分类 累计数量和金额
+    
+    在报销的创建、编辑、删除、审批处理中与业务数据同一事务增量维护，
+    统计接口读这张表，开销与天数×维度组合数相关而与报销行数无关。
+    """
+    __tablename__ = 'expense_daily_rollup'
+    day = db.Column(db.Date, primary_key=True)  # 报销日期 expense_date
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    currency = db.Column(db.String(10), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # 原币金额合计
+    sum_usd = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # 美元金额合计
+    
+    # 索引：员工范围的统计
+    __table_args__ = (
+        db.Index('ix_expense_daily_rollup_user_day', 'user_id', 'day'),
+    )
+
+# 业务日
+def business_today():
+    """业务时区的今天"""
+    return datetime.now(ZoneInfo(app.config['BUSINESS_TIMEZONE'])).date()
+
+def business_day_range(day=None):
+    """业务时区中某一天（默认今天）对应的 UTC 半开区间 [开始, 结束)
+    
+    返回不带时区的 UTC 时间，可直接与 created_at/approved_at 比较并使用索引。
+    """
+    tz = ZoneInfo(app.config['BUSINESS_TIMEZONE'])
+    day = day or datetime.now(tz).date()
+    start = datetime.combine(day, datetime.min.time(), tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+    return (start.astimezone(timezone.utc).replace(tzinfo=None),
+            end.astimezone(timezone.utc).replace(tzinfo=None))
+
+# 数据版本作用域
+GLOBAL_DATA_SCOPE = 'global'
+
+def user_data_scope(user_id):
+    return f'user:{user_id}'
+
+def bump_data_version(*user_ids, include_global=True):
+    """在当前事务中递增相关用户（以及全局）的数据版本，随业务数据一起提交"""
+    scopes = {user_data_scope(user_id) for user_id in user_ids if user_id is not None}
+    if include_global:
+        scopes.add(GLOBAL_DATA_SCOPE)
+    
+    for scope in sorted(scopes):
+        result = db.session.execute(
+            update(DataVersion)
+            .where(DataVersion.scope == scope)
+            .values(version=DataVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(DataVersion).values(scope=scope, version=1))
+    
+    # 本进程内的缓存立即释放；其他进程靠缓存键中的数据版本发现变化
+    trend_chart_cache.evict_scopes(scopes)
+    stats_cache.evict_scopes(scopes)
+    # 提交后再发布变更（唤醒管理员统计刷新线程和通知推送连接），避免它们读到提交前的数据
+    db.session.info.setdefault('changed_scopes', set()).update(scopes)
+
+def bump_all_data_versions():
+    """批量数据变更（清库、重置）后让所有作用域的缓存失效"""
+    db.session.execute(update(DataVersion).values(version=DataVersion.version + 1))
+    bump_data_version(include_global=True)
+    trend_chart_cache.clear()
+    stats_cache.clear()
+
+class DataChangeBroker:
+    """进程内的数据变更广播：按作用域递增序号并唤醒等待者
+    
+    本进程的事务提交后直接发布；其他 gunicorn worker 的写入由本进程唯一的数据版本轮询线程
+    （_data_version_poller）从 data_version 表发现后发布，等待者自己不查询数据库。
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._sequences = {}
+        self._subscribers = {}
+    
+    def publish(self, scopes):
+        with self._condition:
+            for scope in scopes:
+                self._sequences[scope] = self._sequences.get(scope, 0) + 1
+            self._condition.notify_all()
+    
+    def sequence(self, scope):
+        with self._condition:
+            return self._sequences.get(scope, 0)
+    
+    def wait(self, scope, seen, timeout):
+        """等到作用域序号不同于 seen 或超时，返回最新序号"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequences.get(scope, 0) != seen, timeout)
+            return self._sequences.get(scope, 0)
+    
+    def subscribe(self, scope):
+        """登记一个等待该作用域的连接，轮询线程只检查有连接在等的作用域"""
+        with self._condition:
+            self._subscribers[scope] = self._subscribers.get(scope, 0) + 1
+    
+    def unsubscribe(self, scope):
+        with self._condition:
+            remaining = self._subscribers.get(scope, 0) - 1
+            if remaining > 0:
+                self._subscribers[scope] = remaining
+            else:
+                self._subscribers.pop(scope, None)
+    
+    def subscribed_scopes(self):
+        with self._condition:
+            return list(self._subscribers)
+
+data_change_broker = DataChangeBroker()
+
+_data_version_poller_thread = None
+_data_version_poller_lock = threading.Lock()
+
+def _data_version_poller():
+    """每 NOTIFICATION_STREAM_POLL 秒用一条查询读取所有被订阅作用域的数据版本，有变化（含其他 worker 的写入）时发布
+    
+    每个进程只有一个，N 个推送连接的开销是每个周期一次主键 IN 查询，而不是每个连接各查一次。
+    """
+    versions = {}
+    while True:
+        time.sleep(app.config['NOTIFICATION_STREAM_POLL'])
+        scopes = data_change_broker.subscribed_scopes()
+        if not scopes:
+            versions.clear()
+            continue
+        try:
+            with app.app_context():
+                current = dict(db.session.execute(
+                    select(DataVersion.scope, DataVersion.version).where(DataVersion.scope.in_(scopes))
+                ).all())
+        except Exception as e:
+            print(f"读取数据版本失败: {e}")
+            continue
+        changed = [scope for scope in scopes if versions.get(scope) != current.get(scope, 0)]
+        versions = {scope: current.get(scope, 0) for scope in scopes}
+        if changed:
+            data_change_broker.publish(changed)
+
+def ensure_data_version_poller():
+    """按需启动本进程的数据版本轮询线程（第一个推送连接建立时），只读不写"""
+    global _data_version_poller_thread
+    with _data_version_poller_lock:
+        if _data_version_poller_thread is None:
+            _data_version_poller_thread = threading.Thread(
+                target=_data_version_poller, name='data-version-poller', daemon=True
+            )
+            _data_version_poller_thread.start()
+
+@event.listens_for(Session, 'after_commit')
+def _publish_changed_scopes(session):
+    """数据版本随事务提交后，唤醒管理员统计刷新线程和等待该作用域的推送连接"""
+    scopes = session.info.pop('changed_scopes', None)
+    if scopes:
+        if GLOBAL_DATA_SCOPE in scopes:
+            _admin_stats_dirty.set()
+        data_change_broker.publish(scopes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_scopes(session):
+    session.info.pop('changed_scopes', None)
+
+def get_data_version(scope):
+    """读取作用域当前的数据版本（主键查询，不访问报销表）"""
+    version = db.session.execute(
+        select(DataVersion.version).where(DataVersion.scope == scope)
+    ).scalar()
+    return version or 0
+
+def resolve_data_scope(kind='expenses'):
+    """当前会话对应的数据作用域：报销数据管理员看全局，通知总是按用户"""
+    if kind == 'expenses' and session.get('role') == 'admin':
+        return GLOBAL_DATA_SCOPE
+    return user_data_scope(session['user_id'])
+
+def etag_by_data_version(kind='expenses'):
+    """读接口装饰器：按数据版本生成 ETag，If-None-Match 命中时直接返回 304"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'user_id' not in session:
+                return view(*args, **kwargs)
+            
+            scope = resolve_data_scope(kind)
+            version = get_data_version(scope)
+            # 日期参与计算，保证"今日统计"跨天后重新生成
+            raw = f'{request.endpoint}|{scope}|{version}|{business_today()}|{request.query_string.decode()}'
+            etag = hashlib.md5(raw.encode('utf-8')).hexdigest()
+            
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+class StatsCache:
+    """有界 LRU + TTL 缓存，键的前两项为 (端点, 数据作用域)
+    
+    条目同时记录数据版本：本进程的写操作按作用域精确淘汰，其他进程的写操作
+    在读取时通过版本不一致发现；不受数据版本覆盖的变化（如用户、货币表）由 TTL 兜底。
+    """
+    
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, version):
+        """命中返回缓存值，过期、版本不一致或不存在返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def set(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def evict_scopes(self, scopes):
+        """淘汰指定作用域的全部条目"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in scopes]:
+                del self._entries[key]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+stats_cache = StatsCache(app.config['STATS_CACHE_SIZE'], app.config['STATS_CACHE_TTL'])
+trend_chart_cache = StatsCache(app.config['TREND_CHART_CACHE_SIZE'], app.config['TREND_CHART_CACHE_TTL'])
+
+def cached_stats(kind='expenses'):
+    """统计接口装饰器：按 (端点, 作用域, 查询参数, 日期) 缓存 200 响应的 JSON"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'user_id' not in session:
+                return view(*args, **kwargs)
+            
+            scope = resolve_data_scope(kind)
+            version = get_data_version(scope)
+            # 日期参与计算，保证"今日统计"跨天后重新生成
+            key = (request.endpoint, scope, request.query_string.decode(), business_today())
+            
+            body = stats_cache.get(key, version)
+            if body is not None:
+                return app.response_class(body, mimetype='application/json')
+            
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                stats_cache.set(key, version, response.get_data())
+            return response
+        return wrapper
+    return decorator
 
 def create_notification(user_id, title, message, notification_type='info', expense_id=None):
     """创建通知"""
@@ -171,8 +554,260 @@ def create_notification(user_id, title, message, notification_type='info', expen
         related_expense_id=expense_id
     )
     db.session.add(notification)
+    adjust_unread_count(user_id, 1)
+    bump_data_version(user_id, include_global=False)
     return notification
 
+# 未读通知计数维护
+def adjust_unread_count(user_id, delta):
+    """在当前事务中调整用户的未读计数，不会减到负数"""
+    if not delta:
+        return
+    result = db.session.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread=func.max(NotificationCounter.unread + delta, 0))
+    )
+    if result.rowcount == 0 and delta > 0:
+        db.session.execute(insert(NotificationCounter).values(user_id=user_id, unread=delta))
+
+def unread_counts_source():
+    """按通知表统计的各用户未读数（重建和校验计数用）"""
+    return db.session.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(Notification.is_read == False)
+        .group_by(Notification.user_id)
+    ).all()
+
+def reconcile_unread_counts():
+    """按通知表修复未读计数，返回 [(user_id, 修复前, 实际)]（需调用方提交）"""
+    actual = dict(unread_counts_source())
+    stored = dict(db.session.execute(select(NotificationCounter.user_id, NotificationCounter.unread)).all())
+    drift = [
+        (user_id, stored.get(user_id, 0), actual.get(user_id, 0))
+        for user_id in sorted(set(actual) | set(stored))
+        if stored.get(user_id, 0) != actual.get(user_id, 0)
+    ]
+    if drift:
+        db.session.execute(delete(NotificationCounter))
+        if actual:
+            db.session.execute(insert(NotificationCounter), [
+                {'user_id': user_id, 'unread': count} for user_id, count in actual.items()
+            ])
+    return drift
+
+def delete_expense_notifications(expense_id):
+    """删除报销关联的通知，同时扣减其中未读通知的计数"""
+    unread = db.session.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(Notification.related_expense_id == expense_id, Notification.is_read == False)
+        .group_by(Notification.user_id)
+    ).all()
+    for user_id, count in unread:
+        adjust_unread_count(user_id, -count)
+    return Notification.query.filter_by(related_expense_id=expense_id).delete()
+
+# 报销日汇总维护
+ROLLUP_DIMENSIONS = ('day', 'user_id', 'status', 'currency', 'category')
+CENT = Decimal('0.01')
+
+def quantize_money(value):
+    """金额按分四舍五入（ROUND_HALF_UP，按十进制字符串取整，不受二进制浮点误差影响）
+    
+    报销金额入库前统一用它取整：库中只存两位小数的值，Numeric(10,2) 读出、SQLite ROUND(x, 2)
+    （日汇总重建）和日汇总增量维护得到的都是同一个数。
+    """
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def rollup_money(value):
+    """计入日汇总的金额（按 quantize_money 取整后的 float）"""
+    return float(quantize_money(value))
+
+def apply_expense_rollup(expense, sign=1):
+    """把报销当前的状态和金额计入（sign=1）或移出（sign=-1）日汇总
+    
+    修改状态或金额前先移出、修改后再计入；数量归零的汇总行随即删除。
+    """
+    values = {name: getattr(expense, 'expense_date' if name == 'day' else name) for name in ROLLUP_DIMENSIONS}
+    apply_rollup_delta(values, sign, rollup_money(expense.amount) * sign, rollup_money(expense.usd_amount) * sign)
+
+def apply_rollup_delta(values, count, amount, usd_amount):
+    """给一个汇总行（values 为各维度取值）累加数量和金额，count 为负时移出，可一次处理多条报销"""
+    key = [getattr(ExpenseDailyRollup, name) == values[name] for name in ROLLUP_DIMENSIONS]
+    
+    result = db.session.execute(
+        update(ExpenseDailyRollup)
+        .where(*key)
+        .values(
+            count=ExpenseDailyRollup.count + count,
+            sum_amount=ExpenseDailyRollup.sum_amount + amount,
+            sum_usd=ExpenseDailyRollup.sum_usd + usd_amount
+        )
+    )
+    if result.rowcount == 0:
+        # 移出时找不到汇总行说明汇总表未初始化，留给 scripts/rebuild_rollup.py 修复
+        if count > 0:
+            db.session.execute(insert(ExpenseDailyRollup).values(
+                **values, count=count, sum_amount=amount, sum_usd=usd_amount
+            ))
+    elif count < 0:
+        db.session.execute(delete(ExpenseDailyRollup).where(*key, ExpenseDailyRollup.count <= 0))
+
+def expense_rollup_source():
+    """从报销明细直接聚合出的日汇总（重建和校验用）"""
+    return select(
+        Expense.expense_date.label('day'),
+        Expense.user_id,
+        Expense.status,
+        Expense.currency,
+        Expense.category,
+        func.count(Expense.id).label('count'),
+        func.sum(func.round(Expense.amount, 2)).label('sum_amount'),
+        func.sum(func.round(Expense.usd_amount, 2)).label('sum_usd')
+    ).group_by(Expense.expense_date, Expense.user_id, Expense.status, Expense.currency, Expense.category)
+
+def normalize_expense_amounts():
+    """把历史数据中超过两位小数的金额按分取整（修复前入库的值），返回修改的行数（调用方负责提交）
+    
+    这类值用 Numeric(10,2) 读出和用 ROUND(x, 2) 聚合结果可能差一分，会让日汇总与明细对不上。
+    """
+    return db.session.execute(
+        update(Expense)
+        .where(or_(Expense.amount != func.round(Expense.amount, 2),
+                   Expense.usd_amount != func.round(Expense.usd_amount, 2)))
+        .values(amount=func.round(Expense.amount, 2), usd_amount=func.round(Expense.usd_amount, 2))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def rebuild_expense_rollup():
+    """清空并按报销明细重建日汇总，返回汇总行数（调用方负责提交）"""
+    db.session.execute(delete(ExpenseDailyRollup))
+    source = expense_rollup_source()
+    db.session.execute(insert(ExpenseDailyRollup).from_select(
+        list(ROLLUP_DIMENSIONS) + ['count', 'sum_amount', 'sum_usd'], source
+    ))
+    return db.session.execute(select(func.count()).select_from(ExpenseDailyRollup)).scalar()
+
+def verify_expense_rollup():
+    """对比日汇总与报销明细，返回不一致的 (维度, 汇总值, 明细值) 列表"""
+    def collect(rows):
+        return {
+            tuple(getattr(row, name) for name in ROLLUP_DIMENSIONS):
+                (row.count, float(row.sum_amount or 0), float(row.sum_usd or 0))
+            for row in rows
+        }
+    
+    expected = collect(db.session.execute(expense_rollup_source()))
+    actual = collect(db.session.execute(select(ExpenseDailyRollup.__table__)))
+    
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys(), key=str):
+        have, want = actual.get(key), expected.get(key)
+        if have is None or want is None or have[0] != want[0] or \
+                abs(have[1] - want[1]) > 0.005 or abs(have[2] - want[2]) > 0.005:
+            mismatches.append((key, have, want))
+    return mismatches
+
+def expense_rollup_totals(user_id, *dimensions, day_from=None, day_to=None, categories=None, statuses=None):
+    """按给定维度从日汇总统计数量和金额，user_id 为 None 时统计全部
+    
+    day_from/day_to 为报销日期闭区间，categories 为分类列表，statuses 为状态列表，均可省略。
+    """
+    columns = [getattr(ExpenseDailyRollup, name) for name in dimensions]
+    query = select(
+        *columns,
+        func.sum(ExpenseDailyRollup.count).label('count'),
+        func.sum(ExpenseDailyRollup.sum_amount).label('original_amount'),
+        func.sum(ExpenseDailyRollup.sum_usd).label('usd_amount')
+    ).group_by(*columns)
+    if user_id is not None:
+        query = query.where(ExpenseDailyRollup.user_id == user_id)
+    if day_from:
+        query = query.where(ExpenseDailyRollup.day >= day_from)
+    if day_to:
+        query = query.where(ExpenseDailyRollup.day <= day_to)
+    if categories:
+        query = query.where(ExpenseDailyRollup.category.in_(categories))
+    if statuses:
+        query = query.where(ExpenseDailyRollup.status.in_(statuses))
+    return db.session.execute(query).all()
+
+# 全文搜索：SQLite FTS5 虚拟表 expense_fts（rowid = expense.id），trigram 分词支持中文子串匹配
+expense_fts = table('expense_fts', column('rowid'))
+_search_index_ready = False
+
+# trigram 分词下少于3个字符的词无法命中，这类查询回退到 LIKE
+FTS_MIN_TERM_LENGTH = 3
+
+def ensure_search_index():
+    """创建全文索引虚拟表（已存在时不做任何事）"""
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts "
+        "USING fts5(title, description, submitter, tokenize='trigram')"
+    ))
+
+def search_index_available():
+    """全文索引表是否存在；未执行 scripts/rebuild_search_index.py 的库返回 False"""
+    global _search_index_ready
+    if not _search_index_ready:
+        _search_index_ready = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_fts'"
+        )).first() is not None
+    return _search_index_ready
+
+def sync_expense_search(expense):
+    """在当前事务中写入/刷新一条报销的全文索引"""
+    if not search_index_available():
+        return
+    remove_expense_search(expense.id)
+    db.session.execute(
+        text("INSERT INTO expense_fts (rowid, title, description, submitter) "
+             "VALUES (:id, :title, :description, :submitter)"),
+        {
+            'id': expense.id,
+            'title': expense.title,
+            'description': expense.description or '',
+            'submitter': expense.submitter.username if expense.submitter else ''
+        }
+    )
+
+def remove_expense_search(expense_id):
+    """在当前事务中删除一条报销的全文索引"""
+    if not search_index_available():
+        return
+    db.session.execute(text("DELETE FROM expense_fts WHERE rowid = :id"), {'id': expense_id})
+
+def rebuild_search_index():
+    """清空并从报销表重建全文索引，返回索引的记录数"""
+    ensure_search_index()
+    db.session.execute(text("DELETE FROM expense_fts"))
+    db.session.execute(text(
+        "INSERT INTO expense_fts (rowid, title, description, submitter) "
+        "SELECT e.id, e.title, COALESCE(e.description, ''), COALESCE(u.username, '') "
+        'FROM expense e LEFT JOIN "user" u ON u.id = e.user_id'
+    ))
+    return db.session.execute(text("SELECT COUNT(*) FROM expense_fts")).scalar()
+
+def apply_expense_search(query, keywords):
+    """按关键词过滤报销查询，返回 (query, 是否按相关度排序)"""
+    terms = keywords.split()
+    if search_index_available() and all(len(term) >= FTS_MIN_TERM_LENGTH for term in terms):
+        # 每个词作为短语做子串匹配，词之间为 AND
+        match = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        query = query.join(expense_fts, expense_fts.c.rowid == Expense.id).filter(
+            literal_column('expense_fts').op('MATCH')(match)
+        )
+        return query, True
+    
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(
+            Expense.title.like(pattern),
+            Expense.description.like(pattern),
+            Expense.user_id.in_(select(User.id).where(User.username.like(pattern)))
+        ))
+    return query, False
+
 # 路由定义
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
@@ -286,7 +921,49 @@ try:
 except Exception:
     PYECHARTS_AVAILABLE = False
 
-def generate_trend_chart(user_id, role):
+# 趋势图可选的时间窗口（天），第一个为默认值
+TREND_WINDOWS = (7, 30, 90)
+
+def trend_window_arg(value):
+    """解析趋势图窗口参数，非法值回退到默认窗口"""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return TREND_WINDOWS[0]
+    return days if days in TREND_WINDOWS else TREND_WINDOWS[0]
+
+def trend_series(user_id, role, days=TREND_WINDOWS[0]):
+    """最近 days 天每日提交的美元金额，返回 (日期[月-日], 金额) 两个列表
+    
+    整个窗口只查询一次：created_at 半开区间 [起始日 00:00, 明日 00:00) 可以走 created_at 索引，
+    按日分组后在 Python 中补齐没有数据的日期。
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    window_start = datetime.combine(start_date, datetime.min.time())
+    window_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    
+    day = func.date(Expense.created_at).label('day')
+    query = select(day, func.sum(Expense.usd_amount).label('amount')).where(
+        Expense.created_at >= window_start,
+        Expense.created_at < window_end
+    ).group_by(day)
+    if role != 'admin':
+        query = query.where(Expense.user_id == user_id)
+    
+    # SQLite 的 date() 返回 'YYYY-MM-DD' 字符串
+    daily_amounts = {str(row.day): float(row.amount or 0) for row in db.session.execute(query)}
+    
+    dates = []
+    amounts = []
+    for i in range(days):
+        current_date = start_date + timedelta(days=i)
+        # 格式化日期显示（月-日）
+        dates.append(current_date.strftime('%m-%d'))
+        amounts.append(daily_amounts.get(current_date.isoformat(), 0.0))
+    return dates, amounts
+
+def generate_trend_chart(user_id, role, days=TREND_WINDOWS[0]):
     """生成趋势图表HTML"""
     if not PYECHARTS_AVAILABLE:
         return None
@@ -294,33 +971,9 @@ def generate_trend_chart(user_id, role):
     try:
         import time
         start_time = time.time()
-        print(f"开始生成趋势图表 - User: {user_id}, Role: {role}")
-        
-        from sqlalchemy import func
-        from datetime import timedelta
-        
-        # 近7天趋势数据
-        days = 7
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=days - 1)
-        dates = []
-        amounts = []
-        
-        for i in range(days):
-            current_date = start_date + timedelta(days=i)
-            # 格式化日期显示（月-日）
-            formatted_date = current_date.strftime('%m-%d')
-            dates.append(formatted_date)
-            
-            # 查询当日报销总额
-            base_query = db.session.query(func.sum(Expense.usd_amount)).filter(
-                func.date(Expense.created_at) == current_date
-            )
-            if role != 'admin':
-                base_query = base_query.filter_by(user_id=user_id)
-            
-            daily_amount = base_query.scalar() or 0
-            amounts.append(float(daily_amount))
+        print(f"开始生成趋势图表 - User: {user_id}, Role: {role}, Days: {days}")
+        
+        dates, amounts = trend_series(user_id, role, days)
         
         # 构建简化的pyecharts折线图以提高性能
         line = Line(init_opts=opts.InitOpts(
@@ -375,6 +1028,23 @@ def generate_trend_chart(user_id, role):
         traceback.print_exc()
         return None
 
+def cached_trend_chart(user_id, role, days=TREND_WINDOWS[0]):
+    """按 (作用域, 窗口, 日期) 缓存的趋势图，数据版本变化后重新生成
+    
+    命中时跳过汇总查询和 pyecharts 渲染，只需一次数据版本主键查询；跨天后旧日期的键不再命中，
+    由 LRU 和 TTL 淘汰。
+    """
+    scope = GLOBAL_DATA_SCOPE if role == 'admin' else user_data_scope(user_id)
+    version = get_data_version(scope)
+    key = ('trend_chart', scope, days, datetime.now().date())
+    
+    chart_html = trend_chart_cache.get(key, version)
+    if chart_html is None:
+        chart_html = generate_trend_chart(user_id, role, days)
+        if chart_html:
+            trend_chart_cache.set(key, version, chart_html)
+    return chart_html
+
 @app.route('/dashboard')
 def dashboard():
     """仪表板页面"""
@@ -384,25 +1054,23 @@ def dashboard():
     user_id = session['user_id']
     role = session['role']
     
-    # 统计数据
-    if role == 'admin':
-        total_expenses = Expense.query.count()
-        pending_expenses = Expense.query.filter_by(status='pending').count()
-        approved_expenses = Expense.query.filter_by(status='approved').count()
-    else:
-        total_expenses = Expense.query.filter_by(user_id=user_id).count()
-        pending_expenses = Expense.query.filter_by(user_id=user_id, status='pending').count()
-        approved_expenses = Expense.query.filter_by(user_id=user_id, status='approved').count()
+    # 首屏数据内嵌到页面中，前端无需再请求统计、最近活动和通知接口
+    bootstrap = dashboard_bootstrap_data(user_id, role)
+    basic_stats = bootstrap['stats']['basic_stats']
     
     # 生成pyecharts趋势图表
-    trend_chart_html = generate_trend_chart(user_id, role)
+    trend_days = trend_window_arg(request.args.get('trend_days'))
+    trend_chart_html = cached_trend_chart(user_id, role, trend_days)
     
     return render_template(
         'dashboard.html', 
-        total_expenses=total_expenses,
-        pending_expenses=pending_expenses,
-        approved_expenses=approved_expenses,
-        trend_chart_html=trend_chart_html
+        total_expenses=basic_stats['total'],
+        pending_expenses=basic_stats['pending'],
+        approved_expenses=basic_stats['approved'],
+        bootstrap=bootstrap,
+        trend_chart_html=trend_chart_html,
+        trend_days=trend_days,
+        trend_windows=TREND_WINDOWS
     )
 
 @app.route('/expenses')
@@ -436,18 +1104,371 @@ def approval_detail(expense_id):
     
     return render_template('approval_detail.html', expense=expense)
 
+# 报销序列化
+def expense_files_to_dicts(expense):
+    """附件的列表格式（EXPENSE_FILE_SERIALIZER 在序列化器类之后定义）"""
+    return EXPENSE_FILE_SERIALIZER.many(expense.files)
+
+# 支持预览的文件类型
+FILE_PREVIEW_TYPES = {
+    'image': ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'svg'],
+    'pdf': ['pdf'],
+    'markdown': ['md', 'markdown'],
+    'video': ['mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv']
+}
+
+def expense_file_preview_dict(f):
+    """附件信息（含预览类型和下载地址）"""
+    # 判断文件类型
+    file_ext = f.original_filename.lower().split('.')[-1] if '.' in f.original_filename else ''
+    
+    file_category = 'other'
+    can_preview = False
+    
+    for category, extensions in FILE_PREVIEW_TYPES.items():
+        if file_ext in extensions:
+            file_category = category
+            can_preview = True
+            break
+    
+    return {
+        'id': f.id,
+        'filename': f.filename,
+        'original_filename': f.original_filename,
+        'file_size': f.file_size,
+        'file_type': f.file_type,
+        'file_category': file_category,
+        'can_preview': can_preview,
+        'uploaded_at': f.uploaded_at.isoformat(),
+        'download_url': f'/uploads/{f.filename}'
+    }
+
+def submitter_name(expense, default='未知用户'):
+    return expense.submitter.username if expense.submitter else default
+
+# Decimal 金额列和日期列（含附件的上传时间）：序列化器在构造时为它们绑定转换函数
+DECIMAL_FIELDS = ('amount', 'exchange_rate', 'usd_amount')
+DATE_FIELDS = ('expense_date', 'approved_at', 'created_at', 'updated_at', 'uploaded_at')
+NUMBER_CONVERTERS = {'str': str, 'float': float}
+
+# 非列字段的访问器
+VIRTUAL_FIELD_ACCESSORS = {
+    'submitter': submitter_name,
+    'files': expense_files_to_dicts,
+    'files_preview': lambda expense: [expense_file_preview_dict(f) for f in expense.files],
+    'files_count': lambda expense: len(expense.files),
+}
+
+class ExpenseSerializer:
+    """预编译的报销（及附件）序列化器
+    
+    构造时按 fields 生成并编译一个直接构造字典字面量的函数：列值直接从实例 __dict__ 读取已加载的值，
+    绕过 SQLAlchemy 属性描述符（未加载或已过期的列才回退到属性访问，由 ORM 加载）；金额按 numbers
+    绑定 str/float 转换，日期调用 isoformat()，关联字段和 overrides 调用访问器函数。
+    输出中不再有 Decimal，JSON 编码无需走 default 回调。
+    fields 中的元素可以是字段名，也可以是 (输出键, 字段名)；输出键顺序与 fields 一致。
+    """
+    
+    def __init__(self, fields, numbers='str', overrides=None):
+        overrides = overrides or {}
+        namespace = {'_number': NUMBER_CONVERTERS[numbers]}
+        keys, items = [], []
+        for field in fields:
+            key, name = field if isinstance(field, tuple) else (field, field)
+            accessor = overrides.get(name) or VIRTUAL_FIELD_ACCESSORS.get(name)
+            if accessor:
+                accessor_name = f'_accessor{len(items)}'
+                namespace[accessor_name] = accessor
+                value = f'{accessor_name}(expense)'
+            elif not name.isidentifier():
+                raise ValueError(f'无效的报销字段: {name}')
+            else:
+                column = f'(loaded[{name!r}] if {name!r} in loaded else expense.{name})'
+                if name in DECIMAL_FIELDS:
+                    value = f'None if (value := {column}) is None else _number(value)'
+                elif name in DATE_FIELDS:
+                    value = f'None if (value := {column}) is None else value.isoformat()'
+                else:
+                    value = column
+            keys.append(key)
+            items.append(f'{key!r}: {value}')
+        
+        row = '{' + ', '.join(items) + '}'
+        source = (
+            f'def serialize(expense):\n    loaded = expense.__dict__\n    return {row}\n'
+            f'def many(expenses):\n'
+            f'    return [{row} for expense in expenses for loaded in (expense.__dict__,)]\n'
+        )
+        exec(compile(source, '<ExpenseSerializer>', 'exec'), namespace)
+        self.keys = tuple(keys)
+        self._serialize = namespace['serialize']
+        # 批量序列化是一个列表推导式，没有逐行的方法调用
+        self.many = namespace['many']
+    
+    def __call__(self, expense):
+        return self._serialize(expense)
+
+# 附件的列表格式
+EXPENSE_FILE_SERIALIZER = ExpenseSerializer(
+    ['id', 'filename', 'original_filename', 'file_size', 'file_type', 'uploaded_at']
+)
+
+def _local_format_accessor(name, with_time=False):
+    """导出用的本地格式 YYYY-MM-DD[ HH:MM:SS]，空值为空字符串
+    
+    isoformat 的结果与对应的 strftime 格式相同，但要快得多。
+    """
+    get = attrgetter(name)
+    if with_time:
+        def accessor(expense):
+            value = get(expense)
+            return value.isoformat(' ', 'seconds') if value else ''
+    else:
+        def accessor(expense):
+            value = get(expense)
+            return value.isoformat() if value else ''
+    return accessor
+
+_LIST_FIELDS = [
+    'id', 'title', 'description', 'amount', 'currency', 'exchange_rate', 'usd_amount',
+    'category', 'expense_date', 'status', 'submitter', 'created_at', 'approval_comment'
+]
+
+# 输出格式
+EXPENSE_SERIALIZERS = {
+    # 分页/游标列表：金额为字符串，带附件列表
+    'list': ExpenseSerializer(_LIST_FIELDS + ['files']),
+    # 旧的 limit 列表：金额为浮点数，只带附件数量
+    'legacy': ExpenseSerializer(_LIST_FIELDS + ['files_count'], numbers='float'),
+    # 详情/批量查询：带审批信息和附件预览信息
+    'detail': ExpenseSerializer(
+        _LIST_FIELDS + ['user_id', 'approved_by', 'approved_at', 'updated_at', ('files', 'files_preview')]
+    ),
+    # Excel 导出：中文表头，金额为浮点数，日期为本地格式字符串
+    'export': ExpenseSerializer(
+        [
+            ('ID', 'id'),
+            ('标题', 'title'),
+            ('描述', 'description'),
+            ('分类', 'category'),
+            ('原币金额', 'amount'),
+            ('货币', 'currency'),
+            ('汇率(单位=1美元)', 'exchange_rate'),
+            ('美元金额', 'usd_amount'),
+            ('报销日期', 'expense_date'),
+            ('状态', 'status'),
+            ('申请人', 'submitter'),
+            ('申请人邮箱', 'submitter_email'),
+            ('创建时间', 'created_at'),
+            ('更新时间', 'updated_at'),
+        ],
+        numbers='float',
+        overrides={
+            'description': lambda expense: expense.description or '',
+            'expense_date': _local_format_accessor('expense_date'),
+            'submitter': lambda expense: submitter_name(expense, ''),
+            'submitter_email': lambda expense: expense.submitter.email if expense.submitter else '',
+            'created_at': _local_format_accessor('created_at', with_time=True),
+            'updated_at': _local_format_accessor('updated_at', with_time=True),
+        }
+    ),
+}
+
+@lru_cache(maxsize=128)
+def sparse_expense_serializer(fields, include_files, numbers='str'):
+    """fields= 稀疏字段对应的序列化器，按字段组合缓存"""
+    return ExpenseSerializer(list(fields) + (['files'] if include_files else []), numbers=numbers)
+
+# 稀疏字段（fields=）可选字段 -> 需要从数据库加载的列
+EXPENSE_LIST_FIELDS = {
+    'id': (Expense.id,),
+    'title': (Expense.title,),
+    'description': (Expense.description,),
+    'amount': (Expense.amount,),
+    'currency': (Expense.currency,),
+    'exchange_rate': (Expense.exchange_rate,),
+    'usd_amount': (Expense.usd_amount,),
+    'category': (Expense.category,),
+    'expense_date': (Expense.expense_date,),
+    'status': (Expense.status,),
+    'approval_comment': (Expense.approval_comment,),
+    'approved_at': (Expense.approved_at,),
+    'created_at': (Expense.created_at,),
+    'updated_at': (Expense.updated_at,),
+    'user_id': (Expense.user_id,),
+    'submitter': (Expense.user_id,),
+}
+
+def parse_expense_fields(fields_param):
+    """解析 fields= 参数，未知字段抛出 ValueError"""
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in EXPENSE_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(fields))
+
+def expense_projection_options(fields, include_files):
+    """只加载请求的列：id 和 created_at 始终加载（游标分页需要）"""
+    columns = {Expense.id, Expense.created_at}
+    for field in fields:
+        columns.update(EXPENSE_LIST_FIELDS[field])
+    
+    options = [load_only(*columns)]
+    if 'submitter' in fields:
+        options.append(joinedload(Expense.submitter).load_only(User.username))
+    if include_files:
+        options.append(selectinload(Expense.files))
+    return options
+
+def parse_list_arg(args, name):
+    """多值参数：支持 ?status=a,b 和 ?status=a&status=b，忽略 all"""
+    values = []
+    for raw in args.getlist(name):
+        values.extend(value.strip() for value in raw.split(','))
+    return [value for value in values if value and value != 'all']
+
+def parse_date_arg(args, name):
+    """YYYY-MM-DD 日期参数，格式错误时抛出 ValueError"""
+    value = args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'{name} 应为 YYYY-MM-DD 格式')
+
+def parse_decimal_arg(args, name):
+    """金额参数，格式错误时抛出 ValueError"""
+    value = args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{name} 应为数字')
+
+def apply_expense_filters(query, args, user_id, role):
+    """按权限和请求参数筛选报销查询，返回 (query, 是否按相关度排序)
+    
+    所有条件都落在索引列上（user_id/status/created_at、expense_date、usd_amount），
+    由数据库完成筛选，前端无需拉取全量数据。参数格式错误时抛出 ValueError。
+    """
+    # 普通用户只能看自己的记录；管理员可按申请人筛选
+    if role != 'admin':
+        query = query.filter(Expense.user_id == user_id)
+    elif args.get('submitter_id'):
+        try:
+            query = query.filter(Expense.user_id == int(args['submitter_id']))
+        except ValueError:
+            raise ValueError('submitter_id 应为整数')
+    
+    # 状态、货币、分类筛选（均支持多值）
+    for name, col in (('status', Expense.status), ('currency', Expense.currency), ('category', Expense.category)):
+        values = parse_list_arg(args, name)
+        if len(values) == 1:
+            query = query.filter(col == values[0])
+        elif values:
+            query = query.filter(col.in_(values))
+    
+    # 报销日期区间（包含两端）
+    date_from = parse_date_arg(args, 'date_from')
+    date_to = parse_date_arg(args, 'date_to')
+    if date_from:
+        query = query.filter(Expense.expense_date >= date_from)
+    if date_to:
+        query = query.filter(Expense.expense_date <= date_to)
+    
+    # 申请日期区间：半开区间 [created_from, created_to + 1天)
+    created_from = parse_date_arg(args, 'created_from')
+    created_to = parse_date_arg(args, 'created_to')
+    if created_from:
+        query = query.filter(Expense.created_at >= datetime.combine(created_from, datetime.min.time()))
+    if created_to:
+        query = query.filter(Expense.created_at < datetime.combine(created_to + timedelta(days=1), datetime.min.time()))
+    
+    # 美元金额区间（不同币种只有美元金额可比）
+    min_amount = parse_decimal_arg(args, 'min_amount')
+    max_amount = parse_decimal_arg(args, 'max_amount')
+    if min_amount is not None:
+        query = query.filter(Expense.usd_amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Expense.usd_amount <= max_amount)
+    
+    # 全文搜索（标题、说明、申请人），结果按相关度排序
+    keywords = args.get('q', '').strip()
+    if keywords:
+        return apply_expense_search(query, keywords)
+    return query, False
+
+def encode_expense_cursor(expense, direction):
+    """把 (created_at, id, 方向) 编码为不透明的游标字符串"""
+    payload = json.dumps([expense.created_at.isoformat(), expense.id, direction])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_expense_cursor(cursor):
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, expense_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(expense_id), direction
+    except Exception as e:
+        raise ValueError(f'无效的游标: {cursor}') from e
+
+def paginate_expenses_by_cursor(query, cursor, per_page, serialize=EXPENSE_SERIALIZERS['list']):
+    """按 (created_at, id) 做 keyset 分页，深翻页与首页代价相同，不执行 COUNT/OFFSET"""
+    direction = 'next'
+    if cursor:
+        created_at, expense_id, direction = decode_expense_cursor(cursor)
+        if direction == 'prev':
+            # 向前翻页：取比游标更新的记录，升序取出后再反转
+            query = query.filter(or_(
+                Expense.created_at > created_at,
+                and_(Expense.created_at == created_at, Expense.id > expense_id)
+            )).order_by(Expense.created_at.asc(), Expense.id.asc())
+        else:
+            query = query.filter(or_(
+                Expense.created_at < created_at,
+                and_(Expense.created_at == created_at, Expense.id < expense_id)
+            )).order_by(Expense.created_at.desc(), Expense.id.desc())
+    else:
+        query = query.order_by(Expense.created_at.desc(), Expense.id.desc())
+    
+    # 多取一条用于判断是否还有下一页
+    expenses = query.limit(per_page + 1).all()
+    has_more = len(expenses) > per_page
+    expenses = expenses[:per_page]
+    
+    if direction == 'prev':
+        expenses.reverse()
+        has_next = True
+        has_prev = has_more
+    else:
+        has_next = has_more
+        has_prev = bool(cursor)
+    
+    return {
+        'data': serialize.many(expenses),
+        'pagination': {
+            'per_page': per_page,
+            'has_prev': has_prev and bool(expenses),
+            'has_next': has_next and bool(expenses),
+            'prev_cursor': encode_expense_cursor(expenses[0], 'prev') if expenses and has_prev else None,
+            'next_cursor': encode_expense_cursor(expenses[-1], 'next') if expenses and has_next else None
+        }
+    }
+
 # API 端点
 @app.route('/api/expenses', methods=['GET'])
+@etag_by_data_version()
 def get_expenses():
-    """获取报销记录 - 支持分页"""
+    """获取报销记录 - 支持页码分页、游标分页（cursor）和旧的 limit 模式"""
     if 'user_id' not in session:
         return jsonify({'error': '未登录'}), 401
     
     user_id = session['user_id']
     role = session['role']
-    status = request.args.get('status', 'all')
-    currency = request.args.get('currency', 'all')  # 货币筛选
-    category = request.args.get('category', 'all')  # 新增分类筛选
     
     # 分页参数
     page = request.args.get('page', 1, type=int)
@@ -457,50 +1478,49 @@ def get_expenses():
     # 限制每页最大数量，防止恶意请求
     per_page = min(per_page, 100)
     
-    query = Expense.query
-    
-    # 普通用户只能看自己的记录
-    if role != 'admin':
-        query = query.filter_by(user_id=user_id)
-    
-    # 状态筛选
-    if status and status != 'all':
-        query = query.filter_by(status=status)
+    # 稀疏字段：fields=id,title,... 只查询需要的列，附件需 include=files 显式请求
+    fields = None
+    if request.args.get('fields'):
+        try:
+            fields = parse_expense_fields(request.args['fields'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        include_files = 'files' in request.args.get('include', '').split(',')
+        query = Expense.query.options(*expense_projection_options(fields, include_files))
+        serialize = sparse_expense_serializer(fields, include_files)
+    else:
+        # 预加载申请人和附件，避免逐行懒加载产生 N+1 查询
+        query = Expense.query.options(joinedload(Expense.submitter), selectinload(Expense.files))
+        serialize = EXPENSE_SERIALIZERS['list']
     
-    # 货币筛选
-    if currency and currency != 'all':
-        query = query.filter_by(currency=currency)
+    # 权限范围 + 筛选条件（状态/分类/货币/日期/金额/申请人/全文搜索）
+    if request.args.get('q', '').strip() and 'cursor' in request.args:
+        return jsonify({'error': '搜索结果按相关度排序，不支持游标分页'}), 400
+    try:
+        query, ranked = apply_expense_filters(query, request.args, user_id, role)
+    except ValueError as e:
+        return jsonify({'error': f'筛选参数错误：{e}'}), 400
     
-    # 分类筛选
-    if category and category != 'all':
-        query = query.filter_by(category=category)
+    # 游标分页模式（keyset）：?cursor= 首页，?cursor=<next_cursor/prev_cursor> 翻页
+    if 'cursor' in request.args:
+        try:
+            return jsonify(paginate_expenses_by_cursor(query, request.args.get('cursor'), per_page, serialize))
+        except ValueError:
+            return jsonify({'error': '无效的分页游标'}), 400
     
-    # 排序
-    query = query.order_by(Expense.created_at.desc())
+    # 排序（id 作为同一时间戳下的稳定次序）；搜索时先按相关度（标题权重最高）
+    if ranked:
+        query = query.order_by(text('bm25(expense_fts, 10.0, 1.0, 5.0)'))
+    query = query.order_by(Expense.created_at.desc(), Expense.id.desc())
     
     # 如果有limit参数，使用旧的逻辑（向后兼容）
     if limit:
         expenses = query.limit(limit).all()
-        # 构建旧格式的响应
-        result = []
-        for expense in expenses:
-            result.append({
-                'id': expense.id,
-                'title': expense.title,
-                'description': expense.description,
-                'amount': float(expense.amount),
-                'currency': expense.currency,
-                'exchange_rate': float(expense.exchange_rate),
-                'usd_amount': float(expense.usd_amount),
-                'category': expense.category,
-                'expense_date': expense.expense_date.isoformat(),
-                'status': expense.status,
-                'approval_comment': expense.approval_comment,
-                'created_at': expense.created_at.isoformat(),
-                'submitter': expense.submitter.username if expense.submitter else '未知用户',
-                'files_count': len(expense.files)
-            })
-        return jsonify(result)
+        if fields:
+            return jsonify(sparse_expense_serializer(fields, include_files, numbers='float').many(expenses))
+        
+        # 旧格式的响应
+        return jsonify(EXPENSE_SERIALIZERS['legacy'].many(expenses))
     
     # 新的分页逻辑
     paginated = query.paginate(
@@ -511,32 +1531,7 @@ def get_expenses():
     
     expenses = paginated.items
     
-    result = []
-    for expense in expenses:
-        expense_data = {
-            'id': expense.id,
-            'title': expense.title,
-            'description': expense.description,
-            'amount': str(expense.amount),
-            'currency': expense.currency,
-            'exchange_rate': str(expense.exchange_rate),
-            'usd_amount': str(expense.usd_amount),
-            'category': expense.category,
-            'expense_date': expense.expense_date.isoformat(),
-            'status': expense.status,
-            'submitter': expense.submitter.username if expense.submitter else '未知用户',
-            'created_at': expense.created_at.isoformat(),
-            'approval_comment': expense.approval_comment,
-            'files': [{
-                'id': f.id,
-                'filename': f.filename,
-                'original_filename': f.original_filename,
-                'file_size': f.file_size,
-                'file_type': f.file_type,
-                'uploaded_at': f.uploaded_at.isoformat()
-            } for f in expense.files]
-        }
-        result.append(expense_data)
+    result = serialize.many(expenses)
     
     # 返回分页信息
     return jsonify({
@@ -553,6 +1548,52 @@ def get_expenses():
         }
     })
 
+# 流式导出每批读取的行数
+STREAM_BATCH_SIZE = 1000
+
+@app.route('/api/expenses/stream')
+def stream_expenses():
+    """以 NDJSON 流式输出报销记录（每行一个JSON对象），供对账/同步系统批量读取
+    
+    支持与列表相同的筛选参数以及 fields=、include=files；after_id= 用于断点续传。
+    按主键分批读取（id > 上一批最后的 id），每批序列化后先关闭会话再输出：
+    读事务不会跨越客户端读取的时间，慢客户端不会长期持有 SQLite 共享锁而阻塞写入。
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
+    
+    try:
+        fields = parse_expense_fields(request.args['fields']) if request.args.get('fields') else tuple(EXPENSE_LIST_FIELDS)
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    include_files = 'files' in request.args.get('include', '').split(',')
+    
+    query = Expense.query.options(*expense_projection_options(fields, include_files))
+    try:
+        query, _ = apply_expense_filters(query, request.args, session['user_id'], session['role'])
+    except ValueError as e:
+        return jsonify({'error': f'筛选参数错误：{e}'}), 400
+    
+    serialize = sparse_expense_serializer(fields, include_files)
+    
+    def generate():
+        # 按主键顺序输出，中断后可用最后一行的 id 作为 after_id 继续
+        last_id = after_id
+        while True:
+            expenses = query.filter(Expense.id > last_id).order_by(Expense.id.asc()).limit(STREAM_BATCH_SIZE).all()
+            lines = [json.dumps(serialize(expense), ensure_ascii=False) + '\n' for expense in expenses]
+            if expenses:
+                last_id = expenses[-1].id
+            db.session.close()
+            yield ''.join(lines)
+            if len(expenses) < STREAM_BATCH_SIZE:
+                return
+    
+    response = app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'  # 关闭反向代理缓冲，首批立即下发
+    return response
+
 @app.route('/api/expenses', methods=['POST'])
 def create_expense():
     """创建报销申请"""
@@ -594,8 +1635,9 @@ def create_expense():
         if exchange_rate <= 0:
             return jsonify({'error': '汇率必须大于0'}), 400
         
-        # 计算美元金额（多少单位货币兑换1美元）
-        usd_amount = amount / exchange_rate
+        # 计算美元金额（多少单位货币兑换1美元）；金额先按分取整再入库，保证日汇总与明细一致
+        amount = quantize_money(amount)
+        usd_amount = quantize_money(amount / Decimal(str(exchange_rate)))
         
         # 创建报销记录
         expense = Expense(
@@ -635,6 +1677,9 @@ def create_expense():
         if not saved_files:
             return jsonify({'error': '没有成功上传的文件'}), 400
         
+        apply_expense_rollup(expense)
+        sync_expense_search(expense)
+        bump_data_version(expense.user_id)
         db.session.commit()
         
         return jsonify({
@@ -657,10 +1702,12 @@ def approve_expense(expense_id):
     comment = data.get('comment', '')
     
     expense = Expense.query.get_or_404(expense_id)
+    apply_expense_rollup(expense, -1)
     expense.status = 'approved'
     expense.approval_comment = comment
     expense.approved_by = session['user_id']
     expense.approved_at = datetime.utcnow()
+    apply_expense_rollup(expense)
     
     # 创建通知
     notification_title = f"报销申请已通过"
@@ -673,6 +1720,7 @@ def approve_expense(expense_id):
         expense_id=expense_id
     )
     
+    bump_data_version(expense.user_id)
     db.session.commit()
     
     return jsonify({'success': True})
@@ -698,10 +1746,13 @@ def delete_expense(expense_id):
         ExpenseFile.query.filter_by(expense_id=expense_id).delete()
         
         # 删除相关通知
-        Notification.query.filter_by(related_expense_id=expense_id).delete()
+        delete_expense_notifications(expense_id)
         
         # 删除报销申请
         db.session.delete(expense)
+        apply_expense_rollup(expense, -1)
+        remove_expense_search(expense_id)
+        bump_data_version(expense.user_id)
         db.session.commit()
         
         return jsonify({'success': True})
@@ -762,12 +1813,16 @@ def update_expense(expense_id):
         if exchange_rate <= 0:
             return jsonify({'error': '汇率必须大于0'}), 400
         
-        # 计算美元金额（多少单位货币兑换1美元）
-        usd_amount = amount / exchange_rate
+        # 计算美元金额（多少单位货币兑换1美元）；金额先按分取整再入库，保证日汇总与明细一致
+        amount = quantize_money(amount)
+        usd_amount = quantize_money(amount / Decimal(str(exchange_rate)))
         
         # 删除原有文件记录
         ExpenseFile.query.filter_by(expense_id=expense_id).delete()
         
+        # 先从日汇总中移出旧的状态和金额
+        apply_expense_rollup(expense, -1)
+        
         # 更新报销记录基本信息
         expense.title = title
         expense.description = description
@@ -784,6 +1839,7 @@ def update_expense(expense_id):
         expense.approved_by = None
         expense.approved_at = None
         expense.created_at = datetime.utcnow()  # 更新创建时间
+        apply_expense_rollup(expense)
         
         # 保存新的上传文件
         saved_files = []
@@ -816,6 +1872,8 @@ def update_expense(expense_id):
             expense_id=expense_id
         )
         
+        sync_expense_search(expense)
+        bump_data_version(user_id)
         db.session.commit()
         
         return jsonify({
@@ -843,42 +1901,53 @@ def get_expense_files(expense_id):
     
     files = ExpenseFile.query.filter_by(expense_id=expense_id).all()
     
+    return jsonify([expense_file_preview_dict(f) for f in files])
+
+# 批量查询单次最多的报销数量
+BATCH_LOOKUP_LIMIT = 100
+
+@app.route('/api/expenses/batch')
+def get_expenses_batch():
+    """按 id 批量获取报销记录（含申请人和附件），固定两次查询
+    
+    ?ids=1,2,3；权限与 get_expense_files 相同：普通用户只能看自己的申请。
+    无权限或不存在的 id 分别列在 forbidden / not_found 中。
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
+    
+    try:
+        ids = list(dict.fromkeys(int(value) for value in parse_list_arg(request.args, 'ids')))
+    except ValueError:
+        return jsonify({'error': 'ids 应为逗号分隔的整数'}), 400
+    if not ids:
+        return jsonify({'error': '请提供 ids 参数'}), 400
+    if len(ids) > BATCH_LOOKUP_LIMIT:
+        return jsonify({'error': f'单次最多查询 {BATCH_LOOKUP_LIMIT} 条'}), 400
+    
+    expenses = Expense.query.options(
+        joinedload(Expense.submitter),
+        selectinload(Expense.files)
+    ).filter(Expense.id.in_(ids)).all()
+    found = {expense.id: expense for expense in expenses}
+    
     result = []
-    for f in files:
-        # 判断文件类型
-        file_ext = f.original_filename.lower().split('.')[-1] if '.' in f.original_filename else ''
-        
-        # 支持预览的文件类型
-        preview_types = {
-            'image': ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'svg'],
-            'pdf': ['pdf'],
-            'markdown': ['md', 'markdown'],
-            'video': ['mp4', 'avi', 'mov', 'wmv', 'flv', 'webm', 'mkv']
-        }
-        
-        file_category = 'other'
-        can_preview = False
-        
-        for category, extensions in preview_types.items():
-            if file_ext in extensions:
-                file_category = category
-                can_preview = True
-                break
-        
-        file_data = {
-            'id': f.id,
-            'filename': f.filename,
-            'original_filename': f.original_filename,
-            'file_size': f.file_size,
-            'file_type': f.file_type,
-            'file_category': file_category,
-            'can_preview': can_preview,
-            'uploaded_at': f.uploaded_at.isoformat(),
-            'download_url': f'/uploads/{f.filename}'
-        }
-        result.append(file_data)
+    forbidden = []
+    not_found = []
+    for expense_id in ids:
+        expense = found.get(expense_id)
+        if expense is None:
+            not_found.append(expense_id)
+        elif session['role'] != 'admin' and expense.user_id != session['user_id']:
+            forbidden.append(expense_id)
+        else:
+            result.append(EXPENSE_SERIALIZERS['detail'](expense))
     
-    return jsonify(result)
+    return jsonify({
+        'data': result,
+        'forbidden': forbidden,
+        'not_found': not_found
+    })
 
 @app.route('/api/expenses/<int:expense_id>/reject', methods=['POST'])
 def reject_expense(expense_id):
@@ -890,10 +1959,12 @@ def reject_expense(expense_id):
     comment = data.get('comment', '')
     
     expense = Expense.query.get_or_404(expense_id)
+    apply_expense_rollup(expense, -1)
     expense.status = 'rejected'
     expense.approval_comment = comment
     expense.approved_by = session['user_id']
     expense.approved_at = datetime.utcnow()
+    apply_expense_rollup(expense)
     
     # 创建通知
     notification_title = f"报销申请被拒绝"
@@ -906,11 +1977,171 @@ def reject_expense(expense_id):
         expense_id=expense_id
     )
     
+    bump_data_version(expense.user_id)
     db.session.commit()
     
     return jsonify({'success': True})
 
+# 批量审批：决定 -> (状态, 通知标题, 通知正文模板, 通知类型, 意见为空时的占位)，与单条审批的通知一致
+EXPENSE_DECISIONS = {
+    'approve': ('approved', '报销申请已通过', '您的抧销申请「{title}」已被管理员审批通过。\n审批意见：{comment}', 'success', '无'),
+    'reject': ('rejected', '报销申请被拒绝', '您的抧销申请「{title}」被管理员拒绝。\n拒绝原因：{comment}', 'error', '未提供'),
+}
+
+# 单次批量审批最多的报销条数
+BULK_DECISION_LIMIT = 500
+
+@app.route('/api/expenses/bulk-decision', methods=['POST'])
+def bulk_expense_decision():
+    """批量审批：{"ids": [...], "decision": "approve"|"reject", "comment": "..."}
+    
+    一条 UPDATE ... WHERE id IN (...) AND status = 'pending' RETURNING 完成状态变更，
+    并发审批时只有仍为待审批的报销会被处理；日汇总按维度合并后增减，通知一次批量插入。
+    返回每个 id 的结果：approved/rejected，或 skipped（not_found / not_pending）。
+    """
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': '权限不足'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    decision = data.get('decision')
+    if decision not in EXPENSE_DECISIONS:
+        return jsonify({'error': 'decision 应为 approve 或 reject'}), 400
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids 应为非空的报销 id 列表'}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BULK_DECISION_LIMIT:
+        return jsonify({'error': f'单次最多审批 {BULK_DECISION_LIMIT} 条报销'}), 400
+    comment = data.get('comment') or ''
+    status, notification_title, message_template, notification_type, empty_comment = EXPENSE_DECISIONS[decision]
+    
+    try:
+        now = datetime.utcnow()
+        decided = db.session.execute(
+            update(Expense)
+            .where(Expense.id.in_(ids), Expense.status == 'pending')
+            .values(status=status, approval_comment=comment, approved_by=session['user_id'], approved_at=now)
+            .returning(Expense.id, Expense.user_id, Expense.title, Expense.expense_date,
+                       Expense.currency, Expense.category, Expense.amount, Expense.usd_amount),
+            execution_options={'synchronize_session': False}
+        ).all()
+        
+        if decided:
+            # 日汇总：相同 日期×用户×货币×分类 的报销合并成一次移出（pending）和一次计入（新状态）
+            groups = {}
+            for row in decided:
+                totals = groups.setdefault((row.expense_date, row.user_id, row.currency, row.category), [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += rollup_money(row.amount)
+                totals[2] += rollup_money(row.usd_amount)
+            for (day, user_id, currency, category), (count, amount, usd_amount) in groups.items():
+                values = {'day': day, 'user_id': user_id, 'currency': currency, 'category': category}
+                amount, usd_amount = round(amount, 2), round(usd_amount, 2)
+                apply_rollup_delta({**values, 'status': 'pending'}, -count, -amount, -usd_amount)
+                apply_rollup_delta({**values, 'status': status}, count, amount, usd_amount)
+            
+            message_comment = comment if comment else empty_comment
+            db.session.execute(insert(Notification), [{
+                'user_id': row.user_id,
+                'title': notification_title,
+                'message': message_template.format(title=row.title, comment=message_comment),
+                'type': notification_type,
+                'related_expense_id': row.id,
+                'created_at': now
+            } for row in decided])
+            
+            notified = {}
+            for row in decided:
+                notified[row.user_id] = notified.get(row.user_id, 0) + 1
+            for user_id, count in notified.items():
+                adjust_unread_count(user_id, count)
+            bump_data_version(*notified)
+        
+        # 未处理的 id：区分不存在和已不是待审批
+        decided_ids = {row.id for row in decided}
+        skipped = [i for i in ids if i not in decided_ids]
+        current_status = dict(db.session.execute(
+            select(Expense.id, Expense.status).where(Expense.id.in_(skipped))
+        ).all()) if skipped else {}
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'批量审批失败：{str(e)}'}), 500
+    
+    results = []
+    for expense_id in ids:
+        if expense_id in decided_ids:
+            results.append({'id': expense_id, 'outcome': status})
+        elif expense_id in current_status:
+            results.append({'id': expense_id, 'outcome': 'skipped', 'reason': 'not_pending',
+                            'status': current_status[expense_id]})
+        else:
+            results.append({'id': expense_id, 'outcome': 'skipped', 'reason': 'not_found'})
+    
+    return jsonify({
+        'success': True,
+        'decision': decision,
+        'processed': len(decided_ids),
+        'skipped': len(ids) - len(decided_ids),
+        'results': results
+    })
+
+# 统计服务
+def expense_status_summary(user_id=None):
+    """按状态汇总报销数量和美元金额，user_id 为 None 时统计全部（管理员范围）
+    
+    读日汇总表，用一条条件聚合查询完成，替代原来的4次 COUNT + 3次 SUM。
+    """
+    rollup = ExpenseDailyRollup
+    
+    def count_status(status):
+        return func.coalesce(func.sum(case((rollup.status == status, rollup.count), else_=0)), 0)
+    
+    def sum_usd(status=None):
+        amount = rollup.sum_usd if status is None else case((rollup.status == status, rollup.sum_usd))
+        return func.coalesce(func.sum(amount), 0)
+    
+    query = select(
+        func.coalesce(func.sum(rollup.count), 0).label('total'),
+        count_status('pending').label('pending'),
+        count_status('approved').label('approved'),
+        count_status('rejected').label('rejected'),
+        sum_usd().label('total_amount'),
+        sum_usd('approved').label('approved_amount'),
+        sum_usd('pending').label('pending_amount'),
+    )
+    if user_id is not None:
+        query = query.where(rollup.user_id == user_id)
+    
+    return dict(db.session.execute(query).one()._mapping)
+
+def expense_today_stats(user_id=None):
+    """业务时区今天提交和今天审批通过的报销数，user_id 为 None 时统计全部
+    
+    用 UTC 半开区间比较原始列，提交数走 created_at 索引，通过数走 (status, approved_at) 索引。
+    """
+    day_start, day_end = business_day_range()
+    submitted = select(func.count(Expense.id)).where(
+        Expense.created_at >= day_start,
+        Expense.created_at < day_end
+    )
+    approved = select(func.count(Expense.id)).where(
+        Expense.status == 'approved',
+        Expense.approved_at >= day_start,
+        Expense.approved_at < day_end
+    )
+    if user_id is not None:
+        submitted = submitted.where(Expense.user_id == user_id)
+        approved = approved.where(Expense.user_id == user_id)
+    
+    return {
+        'today_expenses': db.session.execute(submitted).scalar(),
+        'today_approved': db.session.execute(approved).scalar()
+    }
+
 @app.route('/api/stats')
+@etag_by_data_version()
+@cached_stats()
 def get_stats():
     """获取统计数据"""
     if 'user_id' not in session:
@@ -919,25 +2150,18 @@ def get_stats():
     user_id = session['user_id']
     role = session['role']
     
-    if role == 'admin':
-        total = Expense.query.count()
-        pending = Expense.query.filter_by(status='pending').count()
-        approved = Expense.query.filter_by(status='approved').count()
-        rejected = Expense.query.filter_by(status='rejected').count()
-    else:
-        total = Expense.query.filter_by(user_id=user_id).count()
-        pending = Expense.query.filter_by(user_id=user_id, status='pending').count()
-        approved = Expense.query.filter_by(user_id=user_id, status='approved').count()
-        rejected = Expense.query.filter_by(user_id=user_id, status='rejected').count()
+    summary = expense_status_summary(None if role == 'admin' else user_id)
     
     return jsonify({
-        'total': total,
-        'pending': pending,
-        'approved': approved,
-        'rejected': rejected
+        'total': summary['total'],
+        'pending': summary['pending'],
+        'approved': summary['approved'],
+        'rejected': summary['rejected']
     })
 
 @app.route('/api/dashboard_stats')
+@etag_by_data_version()
+@cached_stats()
 def get_dashboard_stats():
     """获取仪表板详细统计数据"""
     try:
@@ -949,136 +2173,10 @@ def get_dashboard_stats():
         
         print(f"Dashboard stats request - User ID: {user_id}, Role: {role}")  # 调试日志
         
-        # 基础统计
         if role == 'admin':
-            total_expenses = Expense.query.count()
-            pending_expenses = Expense.query.filter_by(status='pending').count()
-            approved_expenses = Expense.query.filter_by(status='approved').count()
-            rejected_expenses = Expense.query.filter_by(status='rejected').count()
-            
-            # 总金额统计（使用美元金额）
-            from sqlalchemy import func
-            total_amount = db.session.query(func.sum(Expense.usd_amount)).scalar() or 0
-            approved_amount = db.session.query(func.sum(Expense.usd_amount)).filter_by(status='approved').scalar() or 0
-            pending_amount = db.session.query(func.sum(Expense.usd_amount)).filter_by(status='pending').scalar() or 0
-            
-            # 按类型统计（使用人民币金额）
-            category_stats = db.session.query(
-                Expense.category,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.usd_amount).label('amount')
-            ).group_by(Expense.category).all()
-            
-            # 按货币类型统计
-            currency_stats = db.session.query(
-                Expense.currency,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.amount).label('original_amount'),
-                func.sum(Expense.usd_amount).label('usd_amount')
-            ).group_by(Expense.currency).all()
-            
-            # 按状态和货币统计
-            status_currency_stats = db.session.query(
-                Expense.status,
-                Expense.currency,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.amount).label('original_amount'),
-                func.sum(Expense.usd_amount).label('usd_amount')
-            ).group_by(Expense.status, Expense.currency).all()
-            
-            # 今日统计
-            today = datetime.utcnow().date()
-            today_expenses = Expense.query.filter(
-                func.date(Expense.created_at) == today
-            ).count()
-            today_approved = Expense.query.filter(
-                func.date(Expense.approved_at) == today,
-                Expense.status == 'approved'
-            ).count()
-            
-        else:
-            total_expenses = Expense.query.filter_by(user_id=user_id).count()
-            pending_expenses = Expense.query.filter_by(user_id=user_id, status='pending').count()
-            approved_expenses = Expense.query.filter_by(user_id=user_id, status='approved').count()
-            rejected_expenses = Expense.query.filter_by(user_id=user_id, status='rejected').count()
-            
-            # 总金额统计（使用人民币金额）
-            from sqlalchemy import func
-            total_amount = db.session.query(func.sum(Expense.usd_amount)).filter_by(user_id=user_id).scalar() or 0
-            approved_amount = db.session.query(func.sum(Expense.usd_amount)).filter_by(user_id=user_id, status='approved').scalar() or 0
-            pending_amount = db.session.query(func.sum(Expense.usd_amount)).filter_by(user_id=user_id, status='pending').scalar() or 0
-            
-            # 按类型统计（使用人民币金额）
-            category_stats = db.session.query(
-                Expense.category,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.usd_amount).label('amount')
-            ).filter_by(user_id=user_id).group_by(Expense.category).all()
-            
-            # 按货币类型统计
-            currency_stats = db.session.query(
-                Expense.currency,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.amount).label('original_amount'),
-                func.sum(Expense.usd_amount).label('usd_amount')
-            ).filter_by(user_id=user_id).group_by(Expense.currency).all()
-            
-            # 按状态和货币统计
-            status_currency_stats = db.session.query(
-                Expense.status,
-                Expense.currency,
-                func.count(Expense.id).label('count'),
-                func.sum(Expense.amount).label('original_amount'),
-                func.sum(Expense.usd_amount).label('usd_amount')
-            ).filter_by(user_id=user_id).group_by(Expense.status, Expense.currency).all()
-            
-            # 今日统计
-            today = datetime.utcnow().date()
-            today_expenses = Expense.query.filter(
-                Expense.user_id == user_id,
-                func.date(Expense.created_at) == today
-            ).count()
-            today_approved = Expense.query.filter(
-                Expense.user_id == user_id,
-                func.date(Expense.approved_at) == today,
-                Expense.status == 'approved'
-            ).count()
-        
-        return jsonify({
-            'basic_stats': {
-                'total': total_expenses,
-                'pending': pending_expenses,
-                'approved': approved_expenses,
-                'rejected': rejected_expenses
-            },
-            'amount_stats': {
-                'total_amount': float(total_amount),
-                'approved_amount': float(approved_amount),
-                'pending_amount': float(pending_amount)
-            },
-            'category_stats': [{
-                'category': stat.category,
-                'count': stat.count,
-                'amount': float(stat.amount)
-            } for stat in category_stats],
-            'currency_stats': [{
-                'currency': stat.currency,
-                'count': stat.count,
-                'original_amount': float(stat.original_amount),
-                'usd_amount': float(stat.usd_amount)
-            } for stat in currency_stats],
-            'status_currency_stats': [{
-                'status': stat.status,
-                'currency': stat.currency,
-                'count': stat.count,
-                'original_amount': float(stat.original_amount),
-                'usd_amount': float(stat.usd_amount)
-            } for stat in status_currency_stats],
-            'today_stats': {
-                'today_expenses': today_expenses,
-                'today_approved': today_approved
-            }
-        })
+            # 管理员读后台刷新的快照，耗时与报销表规模无关
+            return app.response_class(admin_stats_snapshot().body, mimetype='application/json')
+        return jsonify(dashboard_stats_data(user_id))
     
     except Exception as e:
         print(f"Dashboard stats error: {str(e)}")  # 调试日志
@@ -1086,69 +2184,206 @@ def get_dashboard_stats():
         traceback.print_exc()
         return jsonify({'error': '获取统计数据失败', 'debug': str(e)}), 500
 
+def dashboard_stats_data(scope_user_id):
+    """仪表板详细统计，scope_user_id 为 None 时统计全部（管理员范围）"""
+    # 基础统计和金额统计（美元金额）、按类型/货币/状态的分组统计均读日汇总表
+    summary = expense_status_summary(scope_user_id)
+    category_stats = expense_rollup_totals(scope_user_id, 'category')
+    currency_stats = expense_rollup_totals(scope_user_id, 'currency')
+    status_currency_stats = expense_rollup_totals(scope_user_id, 'status', 'currency')
+    
+    return {
+        'basic_stats': {
+            'total': summary['total'],
+            'pending': summary['pending'],
+            'approved': summary['approved'],
+            'rejected': summary['rejected']
+        },
+        'amount_stats': {
+            'total_amount': float(summary['total_amount']),
+            'approved_amount': float(summary['approved_amount']),
+            'pending_amount': float(summary['pending_amount'])
+        },
+        'category_stats': [{
+            'category': stat.category,
+            'count': stat.count,
+            'amount': float(stat.usd_amount)
+        } for stat in category_stats],
+        'currency_stats': [{
+            'currency': stat.currency,
+            'count': stat.count,
+            'original_amount': float(stat.original_amount),
+            'usd_amount': float(stat.usd_amount)
+        } for stat in currency_stats],
+        'status_currency_stats': [{
+            'status': stat.status,
+            'currency': stat.currency,
+            'count': stat.count,
+            'original_amount': float(stat.original_amount),
+            'usd_amount': float(stat.usd_amount)
+        } for stat in status_currency_stats],
+        'today_stats': expense_today_stats(scope_user_id)
+    }
+
+# 管理员统计快照：后台线程预先计算全局范围的仪表板统计，读取方直接取用
+# body 是序列化好的 JSON（bytes，不可变），整个快照通过一次赋值发布，读取时无需加锁
+AdminStatsSnapshot = namedtuple('AdminStatsSnapshot', 'version day computed_at body')
+
+_admin_stats_snapshot = None
+_admin_stats_dirty = threading.Event()
+_admin_stats_thread = None
+_admin_stats_thread_lock = threading.Lock()
+
+def refresh_admin_stats_snapshot():
+    """重新计算管理员范围的统计并发布快照（需在应用上下文中调用）"""
+    global _admin_stats_snapshot
+    # 先读版本再统计：统计期间若有新提交，版本落后会在下次读取时被发现
+    version = get_data_version(GLOBAL_DATA_SCOPE)
+    day = business_today()
+    body = app.json.dumps(dashboard_stats_data(None)).encode('utf-8')
+    snapshot = AdminStatsSnapshot(version, day, datetime.utcnow(), body)
+    # 请求线程和后台线程可能同时刷新，不让较旧的结果覆盖已发布的新快照
+    current = _admin_stats_snapshot
+    if current is None or (current.version, current.day) <= (version, day):
+        _admin_stats_snapshot = snapshot
+    return snapshot
+
+def admin_stats_snapshot():
+    """返回与当前全局数据版本、当前业务日一致的管理员统计快照
+    
+    后台线程已刷新时只需一次数据版本主键查询；快照过期（其他进程写入或线程尚未追上）时同步计算，
+    保证 ETag 和统计缓存不会存入旧数据。
+    """
+    ensure_admin_stats_refresher()
+    snapshot = _admin_stats_snapshot
+    if (snapshot is None
+            or snapshot.version != get_data_version(GLOBAL_DATA_SCOPE)
+            or snapshot.day != business_today()):
+        snapshot = refresh_admin_stats_snapshot()
+    return snapshot
+
+def _admin_stats_refresher(interval):
+    """后台刷新循环：被标脏时立即刷新，否则每 interval 秒检查一次（发现其他进程的写入和跨日）"""
+    while True:
+        _admin_stats_dirty.wait(interval)
+        _admin_stats_dirty.clear()
+        try:
+            with app.app_context():
+                snapshot = _admin_stats_snapshot
+                if (snapshot is None
+                        or snapshot.version != get_data_version(GLOBAL_DATA_SCOPE)
+                        or snapshot.day != business_today()):
+                    refresh_admin_stats_snapshot()
+        except Exception as e:
+            print(f"刷新管理员统计快照失败: {e}")
+
+def ensure_admin_stats_refresher():
+    """按需启动本进程的后台刷新线程（gunicorn 每个 worker 各自一个，首次读取时启动）"""
+    global _admin_stats_thread
+    interval = app.config['ADMIN_STATS_REFRESH_INTERVAL']
+    if not interval or (_admin_stats_thread is not None and _admin_stats_thread.is_alive()):
+        return
+    with _admin_stats_thread_lock:
+        if _admin_stats_thread is None or not _admin_stats_thread.is_alive():
+            _admin_stats_thread = threading.Thread(
+                target=_admin_stats_refresher, args=(interval,),
+                name='admin-stats-refresher', daemon=True
+            )
+            _admin_stats_thread.start()
+
+# 仪表板"最近活动"列表的字段
+DASHBOARD_RECENT_FIELDS = ('id', 'title', 'amount', 'currency', 'usd_amount', 'status', 'submitter', 'created_at')
+DASHBOARD_RECENT_LIMIT = 5
+DASHBOARD_NOTIFICATION_LIMIT = 20
+
+def recent_expenses_data(scope_user_id, limit=DASHBOARD_RECENT_LIMIT):
+    """最近提交的报销（与 /api/expenses?limit=&fields= 的输出一致）"""
+    query = Expense.query.options(*expense_projection_options(DASHBOARD_RECENT_FIELDS, False))
+    if scope_user_id is not None:
+        query = query.filter(Expense.user_id == scope_user_id)
+    expenses = query.order_by(Expense.created_at.desc(), Expense.id.desc()).limit(limit).all()
+    return sparse_expense_serializer(DASHBOARD_RECENT_FIELDS, False, numbers='float').many(expenses)
+
+def dashboard_bootstrap_data(user_id, role):
+    """仪表板首屏需要的全部数据：统计、最近活动、通知列表和未读数
+    
+    各部分在同一个数据库会话中依次查询（会话不是线程安全的），作用域只解析一次。
+    """
+    scope_user_id = None if role == 'admin' else user_id
+    if role == 'admin':
+        stats = json.loads(admin_stats_snapshot().body)
+    else:
+        stats = dashboard_stats_data(user_id)
+    return {
+        'stats': stats,
+        'recent_expenses': recent_expenses_data(scope_user_id),
+        'notifications': list_notifications(user_id, DASHBOARD_NOTIFICATION_LIMIT),
+        'unread_count': unread_notification_count(user_id)
+    }
+
+@app.route('/api/dashboard/bootstrap')
+def get_dashboard_bootstrap():
+    """仪表板首屏数据：一次请求返回统计、最近活动和通知"""
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
+    
+    return jsonify(dashboard_bootstrap_data(session['user_id'], session['role']))
+
 @app.route('/api/currency_stats')
+@etag_by_data_version()
+@cached_stats()
 def get_currency_stats():
-    """获取货币统计数据"""
+    """获取货币统计数据，可按报销日期区间（date_from/date_to）和分类（category）筛选"""
     if 'user_id' not in session:
         return jsonify({'error': '未登录'}), 401
     
     user_id = session['user_id']
     role = session['role']
     
-    from sqlalchemy import func
-    
-    # 构建查询基础
-    base_query = db.session.query(
-        Expense.currency,
-        Expense.status,
-        func.count(Expense.id).label('count'),
-        func.sum(Expense.amount).label('original_amount'),
-        func.sum(Expense.usd_amount).label('usd_amount')
-    )
-    
-    # 根据权限限制查询范围
-    if role != 'admin':
-        base_query = base_query.filter_by(user_id=user_id)
-    
-    # 按货币和状态分组统计
-    currency_status_stats = base_query.group_by(Expense.currency, Expense.status).all()
-    
-    # 按货币分组统计（总计）
-    currency_total_query = db.session.query(
-        Expense.currency,
-        func.count(Expense.id).label('count'),
-        func.sum(Expense.amount).label('original_amount'),
-        func.sum(Expense.usd_amount).label('usd_amount')
+    # 可选筛选：报销日期区间和分类
+    try:
+        day_from = parse_date_arg(request.args, 'date_from')
+        day_to = parse_date_arg(request.args, 'date_to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    categories = parse_list_arg(request.args, 'category')
+    
+    # 只查一次 货币×状态 分组（读日汇总表），货币总计在 Python 中累加得到
+    scope_user_id = None if role == 'admin' else user_id
+    currency_status_stats = expense_rollup_totals(
+        scope_user_id, 'currency', 'status',
+        day_from=day_from, day_to=day_to, categories=categories
     )
     
-    if role != 'admin':
-        currency_total_query = currency_total_query.filter_by(user_id=user_id)
-    
-    currency_totals = currency_total_query.group_by(Expense.currency).all()
-    
     # 格式化返回数据
     currency_summary = {}
-    for stat in currency_totals:
-        currency_summary[stat.currency] = {
-            'currency': stat.currency,
-            'total_count': stat.count,
-            'total_original_amount': float(stat.original_amount),
-            'total_usd_amount': float(stat.usd_amount),
-            'status_breakdown': {
-                'pending': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0},
-                'approved': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0},
-                'rejected': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0}
+    for stat in currency_status_stats:
+        summary = currency_summary.get(stat.currency)
+        if summary is None:
+            summary = currency_summary[stat.currency] = {
+                'currency': stat.currency,
+                'total_count': 0,
+                'total_original_amount': Decimal('0'),
+                'total_usd_amount': Decimal('0'),
+                'status_breakdown': {
+                    'pending': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0},
+                    'approved': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0},
+                    'rejected': {'count': 0, 'original_amount': 0.0, 'usd_amount': 0.0}
+                }
             }
+        
+        summary['total_count'] += stat.count
+        summary['total_original_amount'] += stat.original_amount
+        summary['total_usd_amount'] += stat.usd_amount
+        summary['status_breakdown'][stat.status] = {
+            'count': stat.count,
+            'original_amount': float(stat.original_amount),
+            'usd_amount': float(stat.usd_amount)
         }
     
-    # 填充状态明细
-    for stat in currency_status_stats:
-        if stat.currency in currency_summary:
-            currency_summary[stat.currency]['status_breakdown'][stat.status] = {
-                'count': stat.count,
-                'original_amount': float(stat.original_amount),
-                'usd_amount': float(stat.usd_amount)
-            }
+    for summary in currency_summary.values():
+        summary['total_original_amount'] = float(summary['total_original_amount'])
+        summary['total_usd_amount'] = float(summary['total_usd_amount'])
     
     return jsonify({
         'currency_summary': list(currency_summary.values()),
@@ -1156,7 +2391,209 @@ def get_currency_stats():
     })
 
 
+# 时间序列分析：时间粒度 -> (SQL 分桶表达式, 桶起始日, 下一个桶起始日, 默认桶数)
+# 分桶在 SQLite 中完成，桶以起始日期 YYYY-MM-DD 表示（周从周一开始）
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+ANALYTICS_INTERVALS = {
+    'day': (
+        lambda col: func.date(col),
+        lambda day: day,
+        lambda day: day + timedelta(days=1),
+        30
+    ),
+    'week': (
+        lambda col: func.date(col, 'weekday 0', '-6 days'),
+        lambda day: day - timedelta(days=day.weekday()),
+        lambda day: day + timedelta(days=7),
+        12
+    ),
+    'month': (
+        lambda col: func.strftime('%Y-%m-01', col),
+        lambda day: day.replace(day=1),
+        lambda day: _add_months(day, 1),
+        12
+    ),
+    'quarter': (
+        lambda col: func.printf(
+            '%s-%02d-01', func.strftime('%Y', col),
+            (db.cast(func.strftime('%m', col), db.Integer) - 1) // 3 * 3 + 1
+        ),
+        lambda day: day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1),
+        lambda day: _add_months(day, 3),
+        8
+    ),
+}
+
+# 可分组的维度：参数名 -> 日汇总列
+ANALYTICS_DIMENSIONS = {
+    'category': ExpenseDailyRollup.category,
+    'currency': ExpenseDailyRollup.currency,
+    'status': ExpenseDailyRollup.status,
+    'user': ExpenseDailyRollup.user_id,
+}
+
+# 单次请求最多返回的时间桶数，避免按日粒度查询多年数据
+ANALYTICS_MAX_BUCKETS = 366
+
+def analytics_buckets(interval, day_from, day_to):
+    """[day_from, day_to] 覆盖的全部桶起始日，用于补齐没有数据的桶"""
+    _, bucket_start, next_bucket, _ = ANALYTICS_INTERVALS[interval]
+    buckets = []
+    bucket = bucket_start(day_from)
+    while bucket <= day_to:
+        buckets.append(bucket.isoformat())
+        if len(buckets) > ANALYTICS_MAX_BUCKETS:
+            raise ValueError(f'时间范围过大，最多返回 {ANALYTICS_MAX_BUCKETS} 个时间桶')
+        bucket = next_bucket(bucket)
+    return buckets
+
+def analytics_timeseries_statement(interval, dimensions, user_id, day_from, day_to,
+                                   statuses=None, categories=None, currencies=None):
+    """按时间桶和维度分组的汇总查询（读日汇总表）
+    
+    报销日期用闭区间 day >= day_from AND day <= day_to 过滤：管理员范围走主键（day 在首列），
+    员工范围走 ix_expense_daily_rollup_user_day。
+    """
+    bucket = ANALYTICS_INTERVALS[interval][0](ExpenseDailyRollup.day).label('bucket')
+    columns = [ANALYTICS_DIMENSIONS[name] for name in dimensions]
+    query = select(
+        bucket,
+        *columns,
+        func.sum(ExpenseDailyRollup.count).label('count'),
+        func.sum(ExpenseDailyRollup.sum_amount).label('original_amount'),
+        func.sum(ExpenseDailyRollup.sum_usd).label('usd_amount')
+    ).where(
+        ExpenseDailyRollup.day >= day_from,
+        ExpenseDailyRollup.day <= day_to
+    ).group_by(bucket, *columns).order_by(bucket)
+    if user_id is not None:
+        query = query.where(ExpenseDailyRollup.user_id == user_id)
+    if statuses:
+        query = query.where(ExpenseDailyRollup.status.in_(statuses))
+    if categories:
+        query = query.where(ExpenseDailyRollup.category.in_(categories))
+    if currencies:
+        query = query.where(ExpenseDailyRollup.currency.in_(currencies))
+    return query
+
+def analytics_timeseries_data(interval, dimensions, user_id, day_from, day_to, **filters):
+    """时间序列：每个维度组合一条序列，没有数据的桶补0
+    
+    原币金额只有按货币分组时才有意义，其余情况只返回数量和美元金额。
+    """
+    buckets = analytics_buckets(interval, day_from, day_to)
+    rows = db.session.execute(analytics_timeseries_statement(
+        interval, dimensions, user_id, day_from, day_to, **filters
+    )).all()
+    
+    with_original = 'currency' in dimensions
+    series = {}
+    for row in rows:
+        key = tuple(getattr(row, ANALYTICS_DIMENSIONS[name].key) for name in dimensions)
+        series.setdefault(key, {})[row.bucket] = row
+    
+    usernames = {}
+    if 'user' in dimensions:
+        user_ids = {key[dimensions.index('user')] for key in series}
+        usernames = dict(db.session.execute(
+            select(User.id, User.username).where(User.id.in_(user_ids))
+        ).all()) if user_ids else {}
+    
+    result = []
+    for key in sorted(series, key=lambda key: tuple(str(value) for value in key)):
+        points = series[key]
+        group = dict(zip(dimensions, key))
+        if 'user' in group:
+            group['username'] = usernames.get(group['user'], '未知用户')
+        
+        total_count, total_original, total_usd = 0, Decimal('0'), Decimal('0')
+        values = []
+        for bucket in buckets:
+            row = points.get(bucket)
+            count = row.count if row else 0
+            usd_amount = row.usd_amount if row else Decimal('0')
+            total_count += count
+            total_usd += usd_amount
+            point = {'bucket': bucket, 'count': count, 'usd_amount': float(usd_amount)}
+            if with_original:
+                original_amount = row.original_amount if row else Decimal('0')
+                total_original += original_amount
+                point['original_amount'] = float(original_amount)
+            values.append(point)
+        
+        total = {'count': total_count, 'usd_amount': float(total_usd)}
+        if with_original:
+            total['original_amount'] = float(total_original)
+        result.append({'group': group, 'points': values, 'total': total})
+    
+    return {
+        'interval': interval,
+        'group_by': list(dimensions),
+        'date_from': day_from.isoformat(),
+        'date_to': day_to.isoformat(),
+        'buckets': buckets,
+        'series': result
+    }
+
+@app.route('/api/analytics/timeseries')
+@etag_by_data_version()
+@cached_stats()
+def get_analytics_timeseries():
+    """按 日/周/月/季度 分桶的报销数量和金额，可按 分类/货币/状态/用户 任意组合分组
+    
+    参数：interval（默认 month）、group_by（逗号分隔）、date_from/date_to（报销日期，
+    默认截至今天的若干个完整桶）、status/category/currency 筛选、user_id（仅管理员）。
+    员工只能看到自己的数据。
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
+    
+    interval = request.args.get('interval', 'month')
+    if interval not in ANALYTICS_INTERVALS:
+        return jsonify({'error': f'interval 应为 {"/".join(ANALYTICS_INTERVALS)} 之一'}), 400
+    
+    dimensions = tuple(dict.fromkeys(parse_list_arg(request.args, 'group_by')))
+    unknown = [name for name in dimensions if name not in ANALYTICS_DIMENSIONS]
+    if unknown:
+        return jsonify({'error': f'不支持的分组维度: {", ".join(unknown)}'}), 400
+    
+    try:
+        day_from = parse_date_arg(request.args, 'date_from')
+        day_to = parse_date_arg(request.args, 'date_to') or business_today()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if day_from is None:
+        _, bucket_start, _, default_buckets = ANALYTICS_INTERVALS[interval]
+        day_from = bucket_start(day_to)
+        for _ in range(default_buckets - 1):
+            day_from = bucket_start(day_from - timedelta(days=1))
+    if day_from > day_to:
+        return jsonify({'error': 'date_from 不能晚于 date_to'}), 400
+    
+    # 作用域：员工固定为本人，管理员可选按用户筛选
+    if session['role'] == 'admin':
+        user_id = request.args.get('user_id', type=int)
+    else:
+        user_id = session['user_id']
+    
+    try:
+        data = analytics_timeseries_data(
+            interval, dimensions, user_id, day_from, day_to,
+            statuses=parse_list_arg(request.args, 'status'),
+            categories=parse_list_arg(request.args, 'category'),
+            currencies=parse_list_arg(request.args, 'currency')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(data)
+
+
 @app.route('/api/notifications')
+@etag_by_data_version('notifications')
 def get_notifications():
     """获取用户通知"""
     if 'user_id' not in session:
@@ -1166,27 +2603,124 @@ def get_notifications():
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
     limit = request.args.get('limit', type=int, default=10)
     
+    return jsonify(list_notifications(user_id, limit, unread_only))
+
+def list_notifications(user_id, limit=10, unread_only=False):
+    """用户最新的通知列表"""
     query = Notification.query.filter_by(user_id=user_id)
     
     if unread_only:
         query = query.filter_by(is_read=False)
     
     notifications = query.order_by(Notification.created_at.desc()).limit(limit).all()
+    return [notification_to_dict(notification) for notification in notifications]
+
+def notification_to_dict(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'related_expense_id': notification.related_expense_id
+    }
+
+# 推送通知时每次查询的条数（断线重连补发较多通知时分批读取）
+NOTIFICATION_STREAM_BATCH = 50
+
+def sse_event(data, event=None, event_id=None):
+    """按 text/event-stream 格式编码一条事件"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/api/notifications/stream')
+def notification_stream():
+    """通知推送（Server-Sent Events）
+    
+    事件 id 为通知 id；连接建立时先发送当前起点 id，因此任何重连（包括到达 NOTIFICATION_STREAM_MAX_AGE
+    后的主动断开）浏览器都会带上 Last-Event-ID，从其后补发重连间隔内的通知。只有没有 Last-Event-ID 的
+    新页面连接从最新通知之后开始推送。
+    本进程内的写入提交后立即唤醒连接（data_change_broker），其他 worker 的写入由本进程的
+    数据版本轮询线程在 NOTIFICATION_STREAM_POLL 秒内发现；连接只在被唤醒时查询数据库。事件：
+      notification  新通知（data 为通知内容，与 /api/notifications 一致）
+      unread        未读数变化（data: {"count": n}）
+    空闲时每 NOTIFICATION_STREAM_HEARTBEAT 秒发送一次注释行作为心跳。
+    需要 gunicorn 使用线程 worker（-k gthread），否则每个连接会独占一个同步 worker。
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
     
-    result = []
-    for notification in notifications:
-        notification_data = {
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.type,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.isoformat(),
-            'related_expense_id': notification.related_expense_id
-        }
-        result.append(notification_data)
-    
-    return jsonify(result)
+    user_id = session['user_id']
+    scope = user_data_scope(user_id)
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = db.session.execute(
+            select(func.max(Notification.id)).where(Notification.user_id == user_id)
+        ).scalar() or 0
+    
+    heartbeat = app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    poll = app.config['NOTIFICATION_STREAM_POLL']
+    max_age = app.config['NOTIFICATION_STREAM_MAX_AGE']
+    
+    def generate():
+        nonlocal last_id
+        deadline = time.monotonic() + max_age
+        next_heartbeat = time.monotonic() + heartbeat
+        version = unread = None
+        seen = data_change_broker.sequence(scope)
+        data_change_broker.subscribe(scope)
+        ensure_data_version_poller()
+        
+        try:
+            # 服务端主动断开（到达 max_age）后浏览器等待的重连间隔；同时发送起点 id，
+            # 空闲连接没有推送过通知时，重连也能带上 Last-Event-ID，不丢失重连间隔内创建的通知
+            yield f'retry: {poll * 1000}\nid: {last_id}\n\n'
+            changed = True
+            while True:
+                if changed:
+                    current = get_data_version(scope)
+                    if current != version:
+                        version = current
+                        while True:
+                            notifications = Notification.query.filter(
+                                Notification.user_id == user_id, Notification.id > last_id
+                            ).order_by(Notification.id).limit(NOTIFICATION_STREAM_BATCH).all()
+                            for notification in notifications:
+                                last_id = notification.id
+                                yield sse_event(notification_to_dict(notification), 'notification', notification.id)
+                            if len(notifications) < NOTIFICATION_STREAM_BATCH:
+                                break
+                        
+                        count = unread_notification_count(user_id)
+                        if count != unread:
+                            unread = count
+                            yield sse_event({'count': count}, 'unread')
+                        next_heartbeat = time.monotonic() + heartbeat
+                    # 结束读事务，等待期间不占用数据库连接，下次查询能看到新提交的数据
+                    db.session.close()
+                
+                now = time.monotonic()
+                if now >= deadline:
+                    return
+                if now >= next_heartbeat:
+                    yield ': heartbeat\n\n'
+                    next_heartbeat = now + heartbeat
+                # 只等待广播（本进程提交或轮询线程发布），超时仅用于心跳和到期断开，不查询数据库
+                latest = data_change_broker.wait(scope, seen, min(next_heartbeat, deadline) - now)
+                changed, seen = latest != seen, latest
+        finally:
+            data_change_broker.unsubscribe(scope)
+    
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return response
 
 @app.route('/api/notifications/unread-count')
 def get_unread_notifications_count():
@@ -1194,10 +2728,37 @@ def get_unread_notifications_count():
     if 'user_id' not in session:
         return jsonify({'error': '未登录'}), 401
     
-    user_id = session['user_id']
-    count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
-    
-    return jsonify({'count': count})
+    return jsonify({'count': unread_notification_count(session['user_id'])})
+
+def unread_notification_count(user_id):
+    """未读通知数（读冗余计数表，一次主键查询）"""
+    count = db.session.execute(
+        select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)
+    ).scalar()
+    return count or 0
+
+# 单次批量标记已读最多的通知条数
+NOTIFICATION_BULK_READ_LIMIT = 1000
+
+def mark_notifications_read(user_id, notification_ids=None):
+    """把用户的未读通知标记为已读（ids 为 None 时标记全部），返回实际标记的条数
+    
+    一条 UPDATE ... WHERE is_read = 0 完成，is_read 和 read_at 同时写入（清理按 read_at 判断），
+    未读计数按受影响行数扣减，已读的通知不会被重复计算。
+    """
+    statement = (
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True, read_at=datetime.utcnow())
+    )
+    if notification_ids is not None:
+        statement = statement.where(Notification.id.in_(notification_ids))
+    marked_count = db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+    
+    if marked_count:
+        adjust_unread_count(user_id, -marked_count)
+        bump_data_version(user_id, include_global=False)
+    return marked_count
 
 @app.route('/api/notifications/<int:notification_id>/read', methods=['POST'])
 def mark_notification_read(notification_id):
@@ -1206,49 +2767,176 @@ def mark_notification_read(notification_id):
         return jsonify({'error': '未登录'}), 401
     
     user_id = session['user_id']
-    notification = Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
-    
-    notification.is_read = True
+    if not mark_notifications_read(user_id, [notification_id]):
+        # 没有标记任何行：通知不存在（404）或已经是已读
+        Notification.query.filter_by(id=notification_id, user_id=user_id).first_or_404()
     db.session.commit()
     
     return jsonify({'success': True})
 
+@app.route('/api/notifications/read', methods=['POST'])
+def mark_notifications_read_bulk():
+    """批量标记已读：{"ids": [1, 2, ...]}，只处理当前用户的通知"""
+    if 'user_id' not in session:
+        return jsonify({'error': '未登录'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids 应为通知 id 列表'}), 400
+    if len(ids) > NOTIFICATION_BULK_READ_LIMIT:
+        return jsonify({'error': f'单次最多标记 {NOTIFICATION_BULK_READ_LIMIT} 条通知'}), 400
+    
+    marked_count = mark_notifications_read(session['user_id'], ids) if ids else 0
+    db.session.commit()
+    
+    return jsonify({'success': True, 'marked_count': marked_count})
+
 @app.route('/api/notifications/mark-all-read', methods=['POST'])
 def mark_all_notifications_read():
     """标记所有通知为已读"""
     if 'user_id' not in session:
         return jsonify({'error': '未登录'}), 401
     
-    user_id = session['user_id']
-    notifications = Notification.query.filter_by(user_id=user_id, is_read=False).all()
-    
-    for notification in notifications:
-        notification.is_read = True
-        notification.read_at = datetime.utcnow()  # 记录已读时间
-    
+    marked_count = mark_notifications_read(session['user_id'])
     db.session.commit()
     
-    return jsonify({'success': True, 'marked_count': len(notifications)})
+    return jsonify({'success': True, 'marked_count': marked_count})
+
+# 通知保留清理
+def delete_notifications(notification_ids):
+    """删除一批通知，扣减其中未读通知的计数并递增相关用户的数据版本（需调用方提交）"""
+    unread = db.session.execute(
+        select(Notification.user_id, func.count(Notification.id))
+        .where(Notification.id.in_(notification_ids), Notification.is_read == False)
+        .group_by(Notification.user_id)
+    ).all()
+    for user_id, count in unread:
+        adjust_unread_count(user_id, -count)
+    user_ids = db.session.execute(
+        select(Notification.user_id).where(Notification.id.in_(notification_ids)).distinct()
+    ).scalars().all()
+    deleted_count = db.session.execute(
+        delete(Notification).where(Notification.id.in_(notification_ids)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if user_ids:
+        bump_data_version(*user_ids, include_global=False)
+    return deleted_count
+
+def notification_retention_batches(user_id=None, now=None):
+    """按保留策略依次产出 (策略名, 待删 id 查询)；查询每次只取一批，删完再重新执行
+    
+    策略：read_expired 已读超过 READ_HOURS 小时，age_cap 创建超过 MAX_AGE_DAYS 天（含未读），
+    over_limit 每个用户按创建时间倒序超过 MAX_PER_USER 条的部分。
+    """
+    config = app.config
+    now = now or datetime.utcnow()
+    batch = config['NOTIFICATION_RETENTION_BATCH']
+    scope = [Notification.user_id == user_id] if user_id is not None else []
+    
+    if config['NOTIFICATION_RETENTION_READ_HOURS']:
+        read_before = now - timedelta(hours=config['NOTIFICATION_RETENTION_READ_HOURS'])
+        yield 'read_expired', select(Notification.id).where(
+            *scope, Notification.is_read == True, Notification.read_at < read_before
+        ).limit(batch)
+    
+    if config['NOTIFICATION_RETENTION_MAX_AGE_DAYS']:
+        created_before = now - timedelta(days=config['NOTIFICATION_RETENTION_MAX_AGE_DAYS'])
+        yield 'age_cap', select(Notification.id).where(
+            *scope, Notification.created_at < created_before
+        ).limit(batch)
+    
+    max_per_user = config['NOTIFICATION_RETENTION_MAX_PER_USER']
+    if max_per_user:
+        over_limit_users = db.session.execute(
+            select(Notification.user_id).where(*scope)
+            .group_by(Notification.user_id).having(func.count(Notification.id) > max_per_user)
+        ).scalars().all()
+        for over_user_id in over_limit_users:
+            # 走 ix_notification_user_created 跳过最新的 max_per_user 条
+            yield 'over_limit', select(Notification.id).where(Notification.user_id == over_user_id).order_by(
+                Notification.created_at.desc(), Notification.id.desc()
+            ).offset(max_per_user).limit(batch)
+
+def sweep_notifications(user_id=None, now=None):
+    """按保留策略分批删除通知，每批单独提交以缩短 SQLite 写锁时间，返回各策略删除的条数"""
+    deleted = {'read_expired': 0, 'age_cap': 0, 'over_limit': 0}
+    for policy, statement in notification_retention_batches(user_id, now):
+        while True:
+            notification_ids = db.session.execute(statement).scalars().all()
+            if not notification_ids:
+                break
+            deleted[policy] += delete_notifications(notification_ids)
+            db.session.commit()
+    return deleted
+
+def claim_scheduled_job(name, interval):
+    """距上次运行已满 interval 秒时抢占本周期的执行权，返回是否抢到（已提交）"""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.name == name, or_(
+            ScheduledJob.last_run_at == None,
+            ScheduledJob.last_run_at <= now - timedelta(seconds=interval)
+        ))
+        .values(last_run_at=now)
+    ).rowcount
+    if not claimed and db.session.get(ScheduledJob, name) is None:
+        db.session.add(ScheduledJob(name=name, last_run_at=now))
+        claimed = 1
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其他 worker 同时插入了该任务
+        db.session.rollback()
+        return False
+    return bool(claimed)
+
+NOTIFICATION_RETENTION_JOB = 'notification_retention'
+_notification_sweeper_thread = None
+_notification_sweeper_lock = threading.Lock()
+
+def _notification_sweeper(interval):
+    """后台清理循环：每个 worker 都有一个，通过 scheduled_job 保证每个周期只执行一次"""
+    while True:
+        try:
+            with app.app_context():
+                if claim_scheduled_job(NOTIFICATION_RETENTION_JOB, interval):
+                    deleted = sweep_notifications()
+                    if any(deleted.values()):
+                        print(f"🧹 通知保留清理: 已读过期 {deleted['read_expired']} 条，"
+                              f"超龄 {deleted['age_cap']} 条，超出每人上限 {deleted['over_limit']} 条")
+        except Exception as e:
+            print(f"通知保留清理失败: {e}")
+        time.sleep(interval)
+
+def start_notification_sweeper():
+    """启动本进程的通知清理线程（由 run.py 和 gunicorn.conf.py 的 post_worker_init 显式调用，重复调用无副作用）
+    
+    脚本和测试客户端导入 app 时不会启动，避免意外删除数据。
+    """
+    global _notification_sweeper_thread
+    interval = app.config['NOTIFICATION_RETENTION_INTERVAL']
+    if not interval:
+        return
+    with _notification_sweeper_lock:
+        if _notification_sweeper_thread is None:
+            _notification_sweeper_thread = threading.Thread(
+                target=_notification_sweeper, args=(interval,),
+                name='notification-sweeper', daemon=True
+            )
+            _notification_sweeper_thread.start()
 
 @app.route('/api/notifications/cleanup', methods=['POST'])
 def cleanup_read_notifications():
-    """清理一小时前的已读通知"""
+    """立即按保留策略清理当前用户的通知（后台清理线程会定期处理所有用户）"""
     if 'user_id' not in session:
         return jsonify({'error': '未登录'}), 401
     
-    user_id = session['user_id']
-    # 删除1小时前已读的通知
-    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-    
-    deleted_count = Notification.query.filter(
-        Notification.user_id == user_id,
-        Notification.is_read == True,
-        Notification.read_at < one_hour_ago
-    ).delete()
-    
-    db.session.commit()
+    deleted = sweep_notifications(session['user_id'])
     
-    return jsonify({'success': True, 'deleted_count': deleted_count})
+    return jsonify({'success': True, 'deleted_count': sum(deleted.values())})
 
 # 用户管理API
 @app.route('/api/admin/users', methods=['GET'])
@@ -1338,6 +3026,14 @@ def update_user(user_id):
             if User.query.filter_by(username=data['username']).first():
                 return jsonify({'error': '用户名已存在'}), 400
             user.username = data['username']
+            # 列表里的申请人名称和搜索索引随之变化
+            if search_index_available():
+                db.session.execute(
+                    text("UPDATE expense_fts SET submitter = :username "
+                         "WHERE rowid IN (SELECT id FROM expense WHERE user_id = :user_id)"),
+                    {'username': user.username, 'user_id': user.id}
+                )
+            bump_data_version(user.id)
         
         # 更新邮箱
         if 'email' in data and data['email'] != user.email:
@@ -1401,6 +3097,7 @@ def delete_user(user_id):
         if expense_count > 0:
             return jsonify({'error': f'该用户有 {expense_count} 条费用记录，无法删除'}), 400
         
+        NotificationCounter.query.filter_by(user_id=user_id).delete()
         db.session.delete(user)
         db.session.commit()
         
@@ -1702,26 +3399,7 @@ def export_expenses():
     expenses = query.order_by(Expense.expense_date.asc(), Expense.id.asc()).all()
 
     # 组装导出数据
-    records = []
-    for e in expenses:
-        submitter_name = e.submitter.username if e.submitter else ''
-        submitter_email = e.submitter.email if e.submitter else ''
-        records.append({
-            'ID': e.id,
-            '标题': e.title,
-            '描述': e.description or '',
-            '分类': e.category,
-            '原币金额': float(e.amount),
-            '货币': e.currency,
-            '汇率(单位=1美元)': float(e.exchange_rate),
-            '美元金额': float(e.usd_amount),
-            '报销日期': e.expense_date.strftime('%Y-%m-%d') if e.expense_date else '',
-            '状态': e.status,
-            '申请人': submitter_name,
-            '申请人邮箱': submitter_email,
-            '创建时间': e.created_at.strftime('%Y-%m-%d %H:%M:%S') if e.created_at else '',
-            '更新时间': e.updated_at.strftime('%Y-%m-%d %H:%M:%S') if e.updated_at else ''
-        })
+    records = EXPENSE_SERIALIZERS['export'].many(expenses)
 
     # 生成Excel (使用openpyxl替代pandas)
     output = BytesIO()
@@ -1874,6 +3552,9 @@ def process_image_for_excel(image_path, quality='high'):
         print(f"❌ 图片处理失败: {e}")
         return None, None, None
 
+# 报表中视为图片凭证的附件类型
+IMAGE_FILE_TYPES = ('jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp')
+
 @app.route('/api/reports/preview', methods=['POST'])
 def preview_report_data():
     """预览报表数据"""
@@ -1894,39 +3575,36 @@ def preview_report_data():
         if end_date_str:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
-        # 构建查询
-        query = Expense.query.options(joinedload(Expense.submitter), joinedload(Expense.files))
+        statuses = [status_filter] if status_filter and status_filter != 'all' else None
         
+        # 数量和金额按分类读日汇总表，不再加载报销明细
+        category_stats = expense_rollup_totals(
+            None, 'category', day_from=start_date, day_to=end_date, statuses=statuses
+        )
+        total_records = sum(stat.count for stat in category_stats)
+        total_amount = float(sum((stat.usd_amount for stat in category_stats), Decimal('0')))
+        
+        # 带图片凭证的报销数：同样的筛选条件下一次 EXISTS 计数（走附件的 expense_id 索引）
+        has_image = select(ExpenseFile.id).where(
+            ExpenseFile.expense_id == Expense.id,
+            func.lower(ExpenseFile.file_type).in_(IMAGE_FILE_TYPES)
+        ).exists()
+        image_query = select(func.count(Expense.id)).where(has_image)
         if start_date:
-            query = query.filter(Expense.expense_date >= start_date)
+            image_query = image_query.where(Expense.expense_date >= start_date)
         if end_date:
-            query = query.filter(Expense.expense_date <= end_date)
-        if status_filter and status_filter != 'all':
-            query = query.filter(Expense.status == status_filter)
-        
-        expenses = query.all()
-        
-        # 统计数据
-        total_records = len(expenses)
-        total_amount = sum(float(e.usd_amount) for e in expenses)
-        with_images = len([e for e in expenses if any(f.file_type.lower() in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'] for f in e.files)])
-        
-        # 按类型分组统计
-        category_stats = {}
-        for expense in expenses:
-            category = expense.category
-            if category not in category_stats:
-                category_stats[category] = {'count': 0, 'amount': 0}
-            category_stats[category]['count'] += 1
-            category_stats[category]['amount'] += float(expense.usd_amount)
+            image_query = image_query.where(Expense.expense_date <= end_date)
+        if statuses:
+            image_query = image_query.where(Expense.status.in_(statuses))
+        with_images = db.session.execute(image_query).scalar()
         
         category_breakdown = [
             {
-                'category': cat,
-                'count': stats['count'],
-                'amount': stats['amount']
+                'category': stat.category,
+                'count': stat.count,
+                'amount': float(stat.usd_amount)
             }
-            for cat, stats in category_stats.items()
+            for stat in category_stats
         ]
         category_breakdown.sort(key=lambda x: x['amount'], reverse=True)
         
@@ -2402,8 +4080,7 @@ def create_worksheet(workbook, sheet_name, expenses, include_images, include_com
             col_offset += 1
         
         # 申请人
-        submitter_name = expense.submitter.username if hasattr(expense, 'submitter') and expense.submitter else ''
-        worksheet.write(current_row, col_offset, submitter_name, row_center_format)
+        worksheet.write(current_row, col_offset, submitter_name(expense, ''), row_center_format)
         col_offset += 1
         
         # 处理附件
@@ -2415,7 +4092,7 @@ def create_worksheet(workbook, sheet_name, expenses, include_images, include_com
                 file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_obj.filename)
                 file_ext = file_obj.file_type.lower()
                 
-                if file_ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp']:
+                if file_ext in IMAGE_FILE_TYPES:
                     # 处理图片
                     img_data, img_width, img_height = process_image_for_excel(file_path, image_quality)
                     if img_data and images_added < 3:  # 限制每行最多3张图片
@@ -2621,6 +4298,7 @@ def clear_database():
         # 1. 清除通知（依赖用户和报销）
         notification_count = Notification.query.count()
         Notification.query.delete()
+        NotificationCounter.query.delete()
         clear_results.append(f"通知记录: {notification_count} 条")
         
         # 2. 清除报销附件（依赖报销）
@@ -2628,9 +4306,10 @@ def clear_database():
         ExpenseFile.query.delete()
         clear_results.append(f"附件记录: {file_count} 条")
         
-        # 3. 清除报销记录（依赖用户）
+        # 3. 清除报销记录（依赖用户）及日汇总
         expense_count = Expense.query.count()
         Expense.query.delete()
+        ExpenseDailyRollup.query.delete()
         clear_results.append(f"报销记录: {expense_count} 条")
         
         # 4. 清除货币（依赖用户创建者）
@@ -2648,6 +4327,10 @@ def clear_database():
         User.query.delete()
         clear_results.append(f"用户记录: {user_count} 条")
         
+        if search_index_available():
+            db.session.execute(text("DELETE FROM expense_fts"))
+        bump_all_data_versions()
+        
         # 提交清除操作
         db.session.commit()
         
@@ -2668,6 +4351,7 @@ def clear_database():
         return jsonify({'success': False, 'message': f'清除失败：{str(e)}'}), 500
 
 @app.route('/api/admin/database-stats', methods=['GET'])
+@cached_stats()
 def get_database_stats_api():
     """获取数据库统计信息"""
     if 'user_id' not in session or session.get('role') != 'admin':
@@ -2679,6 +4363,18 @@ def get_database_stats_api():
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取统计失败：{str(e)}'}), 500
 
+@app.route('/api/admin/cache-stats', methods=['GET'])
+def get_cache_stats_api():
+    """统计缓存命中情况（仅管理员，用于调整缓存大小和过期时间）"""
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return jsonify({'error': '权限不足'}), 403
+    
+    return jsonify({
+        'success': True,
+        'stats_cache': stats_cache.stats(),
+        'trend_chart_cache': trend_chart_cache.stats()
+    })
+
 def get_database_stats():
     """获取数据库各表的记录统计"""
     stats = {
@@ -2763,12 +4459,17 @@ def reset_to_defaults():
         
         # 清除顺序（考虑外键约束）
         Notification.query.delete()
+        NotificationCounter.query.delete()
         ExpenseFile.query.delete()
         Expense.query.delete()
+        ExpenseDailyRollup.query.delete()
         Currency.query.delete()
         Category.query.delete()
         User.query.delete()
         
+        if search_index_available():
+            db.session.execute(text("DELETE FROM expense_fts"))
+        bump_all_data_versions()
         db.session.commit()
         
         # 清理上传文件
@@ -8,24 +8,31 @@ class NotificationManager {
         this.notifications = [];
         this.unreadCount = 0;
         this.isDropdownOpen = false;
+        this.eventSource = null;
+        this.streamFailures = 0;
+        this.pollTimer = null;
         this.init();
     }
 
     init() {
         this.createNotificationElements();
         this.bindEvents();
-        this.loadNotifications();
-        this.loadUnreadCount();
         
-        // 定期更新未读计数 - 优化频率
-        setInterval(() => {
+        // 页面内嵌了首屏数据（如仪表板）时直接使用，不再请求接口
+        const bootstrap = window.BOOTSTRAP_DATA;
+        if (bootstrap && bootstrap.notifications) {
+            this.notifications = bootstrap.notifications;
+            this.unreadCount = bootstrap.unread_count;
+            this.renderNotifications();
+            this.updateBadge();
+        } else {
+            this.loadNotifications();
             this.loadUnreadCount();
-        }, 120000); // 2分钟更新一次，减少服务器压力
+        }
         
-        // 定期清理已读通知 - 10分钟清理一次
-        setInterval(() => {
-            this.cleanupReadNotifications();
-        }, 600000); // 10分钟清理一次
+        // 新通知和未读数通过服务端推送获取，推送不可用时才轮询未读计数
+        // 过期通知由服务端后台任务按保留策略清理，页面不再定时请求清理接口
+        this.connectStream();
     }
 
     createNotificationElements() {
@@ -91,6 +98,59 @@ class NotificationManager {
         });
     }
 
+    connectStream() {
+        if (!window.EventSource) {
+            this.startPolling();
+            return;
+        }
+
+        // EventSource 断线后会自动重连并带上 Last-Event-ID，服务端据此补发错过的通知
+        this.eventSource = new EventSource('/api/notifications/stream');
+
+        this.eventSource.addEventListener('open', () => {
+            this.streamFailures = 0;
+            this.stopPolling();
+        });
+
+        this.eventSource.addEventListener('notification', (e) => {
+            const notification = JSON.parse(e.data);
+            if (!this.notifications.some(item => item.id === notification.id)) {
+                this.notifications.unshift(notification);
+                this.renderNotifications();
+            }
+        });
+
+        this.eventSource.addEventListener('unread', (e) => {
+            this.unreadCount = JSON.parse(e.data).count;
+            this.updateBadge();
+        });
+
+        this.eventSource.addEventListener('error', () => {
+            // 连接被拒绝（如未登录）或连续多次重连失败时放弃推送，改为轮询
+            this.streamFailures += 1;
+            if (this.eventSource.readyState === EventSource.CLOSED || this.streamFailures >= 3) {
+                this.eventSource.close();
+                this.eventSource = null;
+                this.startPolling();
+            }
+        });
+    }
+
+    startPolling() {
+        if (this.pollTimer) return;
+        // 2分钟更新一次未读计数，减少服务器压力
+        this.pollTimer = setInterval(() => {
+            this.loadUnreadCount();
+        }, 120000);
+    }
+
+    stopPolling() {
+        if (this.pollTimer) {
+            clearInterval(this.pollTimer);
+            this.pollTimer = null;
+        }
+    }
+
     async loadNotifications() {
         try {
             const response = await fetch('/api/notifications?limit=20');
@@ -0,0 +1,9 @@
+"""
+Gunicorn 配置
+gunicorn 启动时自动加载当前目录下的本文件：gunicorn -w 4 -k gthread --threads 32 -b 0.0.0.0:5000 app.main:app
+"""
+
+def post_worker_init(worker):
+    """每个 worker 启动后开启通知保留清理线程（scheduled_job 表保证同一周期只有一个 worker 执行）"""
+    from app.main import start_notification_sweeper
+    start_notification_sweeper()
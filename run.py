@@ -10,7 +10,7 @@ import sys
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from app.main import app
+from app.main import app, start_notification_sweeper
 
 if __name__ == "__main__":
     # 开发环境启动
@@ -21,6 +21,10 @@ if __name__ == "__main__":
     print(f"📍 访问地址: http://localhost:{port}")
     print(f"🔧 调试模式: {'开启' if debug else '关闭'}")
     
+    # 调试模式下 reloader 的监控进程不处理请求，只在实际服务的子进程中启动后台清理
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_notification_sweeper()
+    
     app.run(
         host="0.0.0.0",
         port=port,
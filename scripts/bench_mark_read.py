@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+标记已读性能对比脚本
+在临时数据库中为一个用户生成未读通知（默认5万条），对比原来逐条加载 ORM 对象修改的"全部已读"与
+mark_notifications_read 单条 UPDATE 的查询次数和耗时，并测量批量标记 1000 个 id 的耗时
+用法: python scripts/bench_mark_read.py [通知条数]
+"""
+import sys
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染正式数据
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench_mark_read.db')}"
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import event, insert, update
+from app.main import (app, db, User, Notification, mark_notifications_read,
+                      adjust_unread_count, reconcile_unread_counts, unread_notification_count)
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+BATCH = 10000
+REPEAT = 3
+BULK_IDS = 1000
+
+def seed_data():
+    """为一个用户批量插入 ROWS 条未读通知，返回用户 id"""
+    db.create_all()
+    user = User(username='压测员工', email='bench@company.com', password='-')
+    db.session.add(user)
+    db.session.commit()
+
+    start = datetime(2025, 1, 1)
+    for offset in range(0, ROWS, BATCH):
+        db.session.execute(insert(Notification), [{
+            'user_id': user.id,
+            'title': f'压测通知 {i}',
+            'message': '压测数据',
+            'type': 'info',
+            'is_read': False,
+            'created_at': start + timedelta(seconds=i),
+        } for i in range(offset, min(offset + BATCH, ROWS))])
+    reconcile_unread_counts()
+    db.session.commit()
+    return user.id
+
+def reset_unread(user_id):
+    """把全部通知恢复为未读"""
+    db.session.execute(update(Notification).values(is_read=False, read_at=None))
+    reconcile_unread_counts()
+    db.session.commit()
+
+def old_mark_all(user_id):
+    """重构前的写法：加载全部未读通知逐个修改"""
+    notifications = Notification.query.filter_by(user_id=user_id, is_read=False).all()
+    for notification in notifications:
+        notification.is_read = True
+        notification.read_at = datetime.utcnow()
+    adjust_unread_count(user_id, -len(notifications))
+    db.session.commit()
+    return len(notifications)
+
+def new_mark_all(user_id):
+    count = mark_notifications_read(user_id)
+    db.session.commit()
+    return count
+
+def new_mark_bulk(user_id):
+    count = mark_notifications_read(user_id, list(range(1, BULK_IDS * 2, 2)))
+    db.session.commit()
+    return count
+
+def measure(fn, user_id):
+    """返回 (标记条数, 查询次数, 最短耗时毫秒)，每次运行前恢复为未读"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    timings = []
+    for _ in range(REPEAT):
+        reset_unread(user_id)
+        db.session.expire_all()
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            start = time.perf_counter()
+            result = fn(user_id)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements), min(timings)
+
+def run_benchmark():
+    with app.app_context():
+        print(f"📦 正在生成 {ROWS} 条未读通知...")
+        user_id = seed_data()
+
+        print(f"{'实现':<16}{'标记条数':>10}{'查询次数':>10}{'耗时(ms)':>12}")
+        for label, fn, expected in (
+            ('ORM逐条全部已读', old_mark_all, ROWS),
+            ('UPDATE全部已读', new_mark_all, ROWS),
+            (f'UPDATE批量{BULK_IDS}条', new_mark_bulk, min(BULK_IDS, ROWS)),
+        ):
+            count, queries, ms = measure(fn, user_id)
+            print(f"{label:<16}{count:>10}{queries:>10}{ms:>12.1f}")
+            if count != expected or unread_notification_count(user_id) != ROWS - expected:
+                print(f"❌ {label}: 标记 {count} 条，期望 {expected} 条")
+                return False
+            if Notification.query.filter(Notification.is_read == True, Notification.read_at == None).count():
+                print(f"❌ {label}: 存在已读但没有 read_at 的通知")
+                return False
+    return True
+
+if __name__ == "__main__":
+    print(f"🚀 标记已读性能对比（{ROWS} 条通知，取 {REPEAT} 次最优）")
+    if run_benchmark():
+        print("✅ 标记结果和未读计数正确")
+    else:
+        print("💥 标记结果不正确！")
+        sys.exit(1)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+报销序列化性能对比脚本
+在内存中构造报销对象（默认1万条），对比原先手写字典循环与 EXPENSE_SERIALIZERS 各输出格式的耗时
+用法: python scripts/bench_serializer.py [行数]
+"""
+import sys
+import os
+import gc
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import User, Expense, ExpenseFile, EXPENSE_SERIALIZERS
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+REPEAT = 10
+
+def build_expenses(rows):
+    """构造不入库的报销对象（每条2个附件）"""
+    users = [User(id=i, username=f'员工{i}', email=f'user{i}@company.com', password='-') for i in range(1, 21)]
+    start = datetime(2025, 1, 1)
+    expenses = []
+    for i in range(rows):
+        expense = Expense(
+            id=i + 1,
+            title=f'差旅报销 {i}',
+            description='出差期间的交通和住宿费用',
+            amount=Decimal('1234.56'),
+            currency='CNY',
+            exchange_rate=Decimal('7.2500'),
+            usd_amount=Decimal('170.28'),
+            category='差旅费',
+            expense_date=(start + timedelta(days=i % 365)).date(),
+            status='pending',
+            created_at=start + timedelta(minutes=i),
+            updated_at=start + timedelta(minutes=i)
+        )
+        expense.submitter = users[i % len(users)]
+        expense.files = [
+            ExpenseFile(id=i * 2 + j, filename=f'{i}_{j}.png', original_filename=f'{j}.png', file_path=f'{i}_{j}.png',
+                        file_size=2048, file_type='png', uploaded_at=start)
+            for j in range(2)
+        ]
+        expenses.append(expense)
+    return expenses
+
+# ---- 重构前的手写循环（对照组） ----
+def old_legacy(expenses):
+    result = []
+    for expense in expenses:
+        result.append({
+            'id': expense.id,
+            'title': expense.title,
+            'description': expense.description,
+            'amount': float(expense.amount),
+            'currency': expense.currency,
+            'exchange_rate': float(expense.exchange_rate),
+            'usd_amount': float(expense.usd_amount),
+            'category': expense.category,
+            'expense_date': expense.expense_date.isoformat(),
+            'status': expense.status,
+            'approval_comment': expense.approval_comment,
+            'created_at': expense.created_at.isoformat(),
+            'submitter': expense.submitter.username if expense.submitter else '未知用户',
+            'files_count': len(expense.files)
+        })
+    return result
+
+def old_list(expenses):
+    result = []
+    for expense in expenses:
+        result.append({
+            'id': expense.id,
+            'title': expense.title,
+            'description': expense.description,
+            'amount': str(expense.amount),
+            'currency': expense.currency,
+            'exchange_rate': str(expense.exchange_rate),
+            'usd_amount': str(expense.usd_amount),
+            'category': expense.category,
+            'expense_date': expense.expense_date.isoformat(),
+            'status': expense.status,
+            'submitter': expense.submitter.username if expense.submitter else '未知用户',
+            'created_at': expense.created_at.isoformat(),
+            'approval_comment': expense.approval_comment,
+            'files': [{
+                'id': f.id,
+                'filename': f.filename,
+                'original_filename': f.original_filename,
+                'file_size': f.file_size,
+                'file_type': f.file_type,
+                'uploaded_at': f.uploaded_at.isoformat()
+            } for f in expense.files]
+        })
+    return result
+
+def old_export(expenses):
+    records = []
+    for e in expenses:
+        submitter_name = e.submitter.username if e.submitter else ''
+        submitter_email = e.submitter.email if e.submitter else ''
+        records.append({
+            'ID': e.id,
+            '标题': e.title,
+            '描述': e.description or '',
+            '分类': e.category,
+            '原币金额': float(e.amount),
+            '货币': e.currency,
+            '汇率(单位=1美元)': float(e.exchange_rate),
+            '美元金额': float(e.usd_amount),
+            '报销日期': e.expense_date.strftime('%Y-%m-%d') if e.expense_date else '',
+            '状态': e.status,
+            '申请人': submitter_name,
+            '申请人邮箱': submitter_email,
+            '创建时间': e.created_at.strftime('%Y-%m-%d %H:%M:%S') if e.created_at else '',
+            '更新时间': e.updated_at.strftime('%Y-%m-%d %H:%M:%S') if e.updated_at else ''
+        })
+    return records
+
+def best_time(fn, expenses):
+    """多次运行取最短耗时（毫秒），分别返回构造字典和 JSON 编码的耗时
+    
+    与 timeit 一样计时期间关闭垃圾回收，避免上万个字典触发的回收把噪声算进某一方。
+    """
+    build_timings, encode_timings = [], []
+    for _ in range(REPEAT):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            records = fn(expenses)
+            built = time.perf_counter()
+            json.dumps(records, ensure_ascii=False)
+            end = time.perf_counter()
+        finally:
+            gc.enable()
+        build_timings.append((built - start) * 1000)
+        encode_timings.append((end - built) * 1000)
+        del records
+    return min(build_timings), min(encode_timings)
+
+def run_benchmark():
+    expenses = build_expenses(ROWS)
+    cases = [
+        ('legacy', old_legacy, EXPENSE_SERIALIZERS['legacy'].many),
+        ('list', old_list, EXPENSE_SERIALIZERS['list'].many),
+        ('export', old_export, EXPENSE_SERIALIZERS['export'].many),
+    ]
+
+    print(f"{'格式':<8}{'实现':<10}{'构造(ms)':>12}{'JSON(ms)':>12}{'合计(ms)':>12}")
+    for name, old_fn, new_fn in cases:
+        # 确认两种实现输出一致；导出表头取自键顺序，额外比较顺序
+        sample_old, sample_new = old_fn(expenses[:50]), new_fn(expenses[:50])
+        assert sample_old == sample_new, f'{name} 输出不一致'
+        if name == 'export':
+            assert list(sample_old[0]) == list(sample_new[0]), 'export 表头顺序不一致'
+        for label, fn in (('手写循环', old_fn), ('序列化器', new_fn)):
+            build_ms, encode_ms = best_time(fn, expenses)
+            print(f"{name:<8}{label:<10}{build_ms:>12.1f}{encode_ms:>12.1f}{build_ms + encode_ms:>12.1f}")
+
+if __name__ == "__main__":
+    print(f"🚀 序列化性能对比（{ROWS} 行，取 {REPEAT} 次最优）")
+    run_benchmark()
+    print("✅ 各输出格式与原实现结果一致")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+状态统计性能对比脚本
+在临时数据库中造数（默认100万条），对比管理员范围下原来的 4次COUNT + 3次SUM 与
+expense_status_summary（读日汇总表的单次条件聚合）的查询次数和耗时
+用法: python scripts/bench_stats.py [行数]
+"""
+import sys
+import os
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染正式数据
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench_stats.db')}"
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import event, func, insert
+from app.main import app, db, User, Expense, expense_status_summary, rebuild_expense_rollup
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+BATCH = 50000
+REPEAT = 3
+
+def seed_data():
+    """批量插入 ROWS 条报销记录"""
+    db.create_all()
+    users = [User(username=f'压测员工{i}', email=f'bench{i}@company.com', password='-') for i in range(50)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [user.id for user in users]
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    statuses = ['pending', 'approved', 'rejected']
+    for offset in range(0, ROWS, BATCH):
+        rows = []
+        for i in range(offset, min(offset + BATCH, ROWS)):
+            amount = round(rng.uniform(10, 5000), 2)
+            rows.append({
+                'title': f'压测报销 {i}',
+                'description': '压测数据',
+                'amount': amount,
+                'currency': 'CNY',
+                'exchange_rate': 7.25,
+                'usd_amount': round(amount / 7.25, 2),
+                'category': '办公费',
+                'expense_date': (start + timedelta(days=i % 365)).date(),
+                'status': statuses[i % 3],
+                'user_id': rng.choice(user_ids),
+                'created_at': start + timedelta(seconds=i * 30),
+                'updated_at': start + timedelta(seconds=i * 30),
+            })
+        db.session.execute(insert(Expense), rows)
+        db.session.commit()
+        print(f"  已插入 {min(offset + BATCH, ROWS)} 行")
+    rebuild_expense_rollup()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+def old_summary():
+    """重构前的写法：4次COUNT + 3次SUM"""
+    return {
+        'total': Expense.query.count(),
+        'pending': Expense.query.filter_by(status='pending').count(),
+        'approved': Expense.query.filter_by(status='approved').count(),
+        'rejected': Expense.query.filter_by(status='rejected').count(),
+        'total_amount': db.session.query(func.sum(Expense.usd_amount)).scalar() or 0,
+        'approved_amount': db.session.query(func.sum(Expense.usd_amount)).filter_by(status='approved').scalar() or 0,
+        'pending_amount': db.session.query(func.sum(Expense.usd_amount)).filter_by(status='pending').scalar() or 0,
+    }
+
+def measure(fn):
+    """返回 (结果, 查询次数, 最短耗时毫秒)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    timings = []
+    for _ in range(REPEAT):
+        statements.clear()
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            start = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements), min(timings)
+
+def run_benchmark():
+    with app.app_context():
+        print(f"📦 正在生成 {ROWS} 行测试数据...")
+        seed_data()
+
+        old_result, old_queries, old_ms = measure(old_summary)
+        new_result, new_queries, new_ms = measure(expense_status_summary)
+
+        for key in old_result:
+            if abs(float(old_result[key]) - float(new_result[key])) > 0.01:
+                print(f"❌ {key} 不一致: {old_result[key]} != {new_result[key]}")
+                return False
+
+        print(f"{'实现':<14}{'查询次数':>10}{'耗时(ms)':>12}")
+        print(f"{'4xCOUNT+3xSUM':<14}{old_queries:>10}{old_ms:>12.1f}")
+        print(f"{'日汇总条件聚合':<14}{new_queries:>10}{new_ms:>12.1f}")
+    return True
+
+if __name__ == "__main__":
+    print(f"🚀 管理员状态统计性能对比（{ROWS} 行，取 {REPEAT} 次最优）")
+    if run_benchmark():
+        print("✅ 两种实现统计结果一致")
+    else:
+        print("💥 统计结果不一致！")
+        sys.exit(1)
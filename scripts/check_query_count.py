@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+报销列表查询次数检查脚本
+在临时数据库中造数，断言 /api/expenses 各模式的SQL查询次数不随行数增长（防止N+1回归）
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染正式数据
+_tmp_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'query_count.db')}"
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import event
+from app.main import app, db, User, Expense, ExpenseFile
+
+ROWS = 100
+
+# 各模式允许的最大查询次数（与行数无关，均含一次数据版本查询）
+MAX_QUERIES = {
+    '/api/expenses?limit=100': 3,                    # 数据版本 + 列表 + 附件批量加载
+    '/api/expenses?page=1&per_page=100': 4,          # 数据版本 + COUNT + 列表 + 附件批量加载
+    '/api/expenses?cursor=&per_page=100': 3,         # 数据版本 + 列表 + 附件批量加载
+}
+
+def seed_data():
+    """创建管理员和 ROWS 条带附件的报销记录"""
+    db.create_all()
+    admin = User(username='检查管理员', email='check-admin@company.com', password='-', role='admin')
+    employee = User(username='检查员工', email='check-user@company.com', password='-', role='employee')
+    db.session.add_all([admin, employee])
+    db.session.flush()
+
+    start = datetime(2025, 1, 1)
+    for i in range(ROWS):
+        expense = Expense(
+            title=f'查询次数检查 {i}',
+            description='查询次数检查数据',
+            amount=100,
+            currency='CNY',
+            exchange_rate=7.25,
+            usd_amount=13.79,
+            category='办公费',
+            expense_date=(start + timedelta(days=i % 28)).date(),
+            user_id=employee.id if i % 2 else admin.id,
+            created_at=start + timedelta(minutes=i)
+        )
+        db.session.add(expense)
+        db.session.flush()
+        for j in range(2):
+            db.session.add(ExpenseFile(
+                filename=f'check_{i}_{j}.png',
+                original_filename=f'check_{j}.png',
+                file_path=f'check_{i}_{j}.png',
+                file_size=1024,
+                file_type='png',
+                expense_id=expense.id
+            ))
+    db.session.commit()
+    return admin
+
+def count_queries(client, url):
+    """统计一次请求执行的SQL语句数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} 返回 {response.status_code}')
+    return len(statements)
+
+def check_query_counts():
+    """逐个模式检查查询次数"""
+    with app.app_context():
+        admin = seed_data()
+        admin_id = admin.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['username'] = '检查管理员'
+        sess['role'] = 'admin'
+
+    failed = False
+    for url, limit in MAX_QUERIES.items():
+        with app.app_context():
+            count = count_queries(client, url)
+        if count > limit:
+            failed = True
+            print(f"❌ {url}: {count} 条查询（上限 {limit}）")
+        else:
+            print(f"✅ {url}: {count} 条查询（上限 {limit}）")
+
+    return not failed
+
+if __name__ == "__main__":
+    print(f"🔍 检查报销列表查询次数（{ROWS} 行）...")
+    if check_query_counts():
+        print("🎉 查询次数检查通过！")
+    else:
+        print("💥 检测到 N+1 查询回归！")
+        sys.exit(1)
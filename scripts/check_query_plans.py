@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+查询计划检查脚本
+对热点查询执行 EXPLAIN QUERY PLAN，确认每条查询都命中为它设计的索引
+"""
+import sys
+import os
+import tempfile
+from datetime import date, datetime
+
+# 默认使用带完整表结构的临时库；传入 --current 时检查当前数据库
+if '--current' not in sys.argv:
+    _tmp_dir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'query_plans.db')}"
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from sqlalchemy import select, func
+from app.main import app, db, Expense, Notification, ExpenseFile, ExpenseDailyRollup, analytics_timeseries_statement
+
+# (说明, 查询, 期望使用的索引)
+HOT_QUERIES = [
+    (
+        '用户按状态筛选的报销列表',
+        select(Expense.id).where(Expense.user_id == 1, Expense.status == 'pending')
+        .order_by(Expense.created_at.desc()),
+        'ix_expense_user_status_created'
+    ),
+    (
+        '用户全部报销列表',
+        select(Expense.id).where(Expense.user_id == 1).order_by(Expense.created_at.desc()),
+        'ix_expense_user_created'
+    ),
+    (
+        '管理员按状态筛选的报销列表',
+        select(Expense.id).where(Expense.status == 'pending').order_by(Expense.created_at.desc()),
+        'ix_expense_status_created'
+    ),
+    (
+        '管理员全部报销列表（游标翻页）',
+        select(Expense.id).where(Expense.created_at < datetime(2025, 1, 1))
+        .order_by(Expense.created_at.desc()),
+        'ix_expense_created'
+    ),
+    (
+        '按报销日期区间导出',
+        select(Expense.id).where(Expense.expense_date >= date(2025, 1, 1), Expense.expense_date <= date(2025, 1, 31)),
+        'ix_expense_expense_date'
+    ),
+    (
+        '用户按报销日期区间筛选',
+        select(Expense.id).where(Expense.user_id == 1, Expense.expense_date >= date(2025, 1, 1),
+                                 Expense.expense_date <= date(2025, 1, 31)),
+        'ix_expense_user_expense_date'
+    ),
+    (
+        '按美元金额区间筛选',
+        select(Expense.id).where(Expense.usd_amount >= 1000, Expense.usd_amount <= 5000),
+        'ix_expense_usd_amount'
+    ),
+    (
+        '管理员多状态筛选',
+        select(Expense.id).where(Expense.status.in_(['pending', 'rejected']))
+        .order_by(Expense.created_at.desc()),
+        'ix_expense_status_created'
+    ),
+    (
+        '用户状态计数',
+        select(func.count(Expense.id)).where(Expense.user_id == 1, Expense.status == 'approved'),
+        'ix_expense_user_status_created'
+    ),
+    (
+        '未读通知数',
+        select(func.count(Notification.id)).where(Notification.user_id == 1, Notification.is_read == False),
+        'ix_notification_user_read_created'
+    ),
+    (
+        '通知列表',
+        select(Notification.id).where(Notification.user_id == 1).order_by(Notification.created_at.desc()),
+        'ix_notification_user_created'
+    ),
+    (
+        '通知保留清理：超出每人上限的部分',
+        select(Notification.id).where(Notification.user_id == 1)
+        .order_by(Notification.created_at.desc(), Notification.id.desc()).offset(500).limit(500),
+        'ix_notification_user_created'
+    ),
+    (
+        '删除报销时清理关联通知',
+        select(Notification.id).where(Notification.related_expense_id == 1),
+        'ix_notification_related_expense'
+    ),
+    (
+        '按报销加载附件',
+        select(ExpenseFile.id).where(ExpenseFile.expense_id == 1),
+        'ix_expense_file_expense_id'
+    ),
+    (
+        '按存储文件名查找附件',
+        select(ExpenseFile.id).where(ExpenseFile.filename == 'example.png'),
+        'ix_expense_file_filename'
+    ),
+    (
+        '趋势图按日汇总（管理员）',
+        select(func.date(Expense.created_at), func.sum(Expense.usd_amount))
+        .where(Expense.created_at >= datetime(2025, 1, 1), Expense.created_at < datetime(2025, 1, 31))
+        .group_by(func.date(Expense.created_at)),
+        'ix_expense_created'
+    ),
+    (
+        '趋势图按日汇总（员工）',
+        select(func.date(Expense.created_at), func.sum(Expense.usd_amount))
+        .where(Expense.user_id == 1, Expense.created_at >= datetime(2025, 1, 1),
+               Expense.created_at < datetime(2025, 1, 31))
+        .group_by(func.date(Expense.created_at)),
+        'ix_expense_user_created'
+    ),
+    (
+        '今日提交数（管理员）',
+        select(func.count(Expense.id))
+        .where(Expense.created_at >= datetime(2025, 1, 1, 16), Expense.created_at < datetime(2025, 1, 2, 16)),
+        'ix_expense_created'
+    ),
+    (
+        '今日审批通过数（管理员）',
+        select(func.count(Expense.id))
+        .where(Expense.status == 'approved', Expense.approved_at >= datetime(2025, 1, 1, 16),
+               Expense.approved_at < datetime(2025, 1, 2, 16)),
+        'ix_expense_status_approved'
+    ),
+    (
+        '员工范围的日汇总统计',
+        select(ExpenseDailyRollup.category, func.sum(ExpenseDailyRollup.count))
+        .where(ExpenseDailyRollup.user_id == 1).group_by(ExpenseDailyRollup.category),
+        'ix_expense_daily_rollup_user_day'
+    ),
+    (
+        '时间序列分析（管理员，按月×分类）',
+        analytics_timeseries_statement('month', ('category',), None, date(2025, 1, 1), date(2025, 12, 31)),
+        'sqlite_autoindex_expense_daily_rollup_1'
+    ),
+    (
+        '时间序列分析（员工，按周×货币）',
+        analytics_timeseries_statement('week', ('currency',), 1, date(2025, 1, 1), date(2025, 3, 31)),
+        'ix_expense_daily_rollup_user_day'
+    ),
+]
+
+def explain(conn, statement):
+    """返回查询计划的 detail 列拼接结果"""
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+def check_query_plans():
+    """逐条检查热点查询的执行计划"""
+    failed = False
+    with app.app_context():
+        db.create_all()
+        with db.engine.connect() as conn:
+            for description, statement, index_name in HOT_QUERIES:
+                plan = explain(conn, statement)
+                if index_name in plan:
+                    print(f"✅ {description}: {plan}")
+                else:
+                    failed = True
+                    print(f"❌ {description}: 期望 {index_name}，实际 {plan}")
+    return not failed
+
+if __name__ == "__main__":
+    print("🔍 检查热点查询执行计划...")
+    if check_query_plans():
+        print("🎉 所有热点查询均使用了索引！")
+    else:
+        print("💥 存在未命中索引的查询！")
+        sys.exit(1)
@@ -9,7 +9,7 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from app.main import app, db, User, Expense, ExpenseFile, Currency, Category
+from app.main import app, db, User, Expense, ExpenseFile, Currency, Category, rebuild_expense_rollup
 from datetime import datetime, date
 
 def init_database():
@@ -152,6 +152,10 @@ def init_database():
         
         db.session.commit()
         
+        # 生成示例数据的日汇总
+        rebuild_expense_rollup()
+        db.session.commit()
+        
         # 创建示例附件（模拟数据）
         sample_files = [
             ExpenseFile(
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+报销日汇总重建/校验脚本
+按报销明细重建 expense_daily_rollup 表并校验，可重复执行
+用法: python scripts/rebuild_rollup.py [--verify]   （--verify 只校验不重建）
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import app, db, bump_all_data_versions, normalize_expense_amounts, rebuild_expense_rollup, verify_expense_rollup
+
+def rebuild():
+    """重建日汇总"""
+    with app.app_context():
+        try:
+            db.create_all()
+            normalized = normalize_expense_amounts()
+            if normalized:
+                print(f"🔧 已将 {normalized} 条报销的金额按分取整")
+            print("🔧 正在重建 expense_daily_rollup 日汇总...")
+            count = rebuild_expense_rollup()
+            # 让已缓存的统计和 ETag 失效
+            bump_all_data_versions()
+            db.session.commit()
+            print(f"✅ 已生成 {count} 行日汇总")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 日汇总重建失败: {e}")
+            return False
+
+    return True
+
+def verify():
+    """对比日汇总与报销明细"""
+    with app.app_context():
+        print("🔍 正在校验日汇总...")
+        mismatches = verify_expense_rollup()
+        for key, actual, expected in mismatches[:20]:
+            print(f"❌ {key}: 汇总 {actual}，明细 {expected}")
+        if len(mismatches) > 20:
+            print(f"... 共 {len(mismatches)} 处不一致")
+        if not mismatches:
+            print("✅ 日汇总与报销明细一致")
+    return not mismatches
+
+if __name__ == "__main__":
+    if '--verify' in sys.argv:
+        ok = verify()
+    else:
+        print("🚀 开始重建报销日汇总...")
+        ok = rebuild() and verify()
+
+    if ok:
+        print("🎉 完成！")
+    else:
+        print("💥 日汇总与报销明细不一致！")
+        sys.exit(1)
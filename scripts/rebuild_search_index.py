@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+全文搜索索引重建脚本
+创建 expense_fts 虚拟表（FTS5）并根据现有报销记录重建索引，可重复执行
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import app, db, bump_all_data_versions, rebuild_search_index
+
+def rebuild():
+    """重建全文索引"""
+    with app.app_context():
+        try:
+            print("🔧 正在重建 expense_fts 全文索引...")
+            count = rebuild_search_index()
+            # 让已缓存的统计和 ETag 失效
+            bump_all_data_versions()
+            db.session.commit()
+            print(f"✅ 已索引 {count} 条报销记录")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 全文索引重建失败: {e}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    print("🚀 开始重建全文搜索索引...")
+    if rebuild():
+        print("🎉 全文搜索索引重建完成！")
+    else:
+        print("💥 全文搜索索引重建失败！")
+        sys.exit(1)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+未读通知计数修复脚本
+按通知表重新统计每个用户的未读数，修复 notification_counter 表中的偏差，可重复执行
+用法: python scripts/reconcile_unread_counts.py [--check]   （--check 只检查不修复）
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import app, db, bump_data_version, reconcile_unread_counts
+
+def reconcile(check_only=False):
+    """修复（或仅检查）未读计数，返回是否一致"""
+    with app.app_context():
+        try:
+            db.create_all()
+            print("🔍 正在核对未读通知计数...")
+            drift = reconcile_unread_counts()
+            for user_id, stored, actual in drift[:20]:
+                print(f"{'❌' if check_only else '🔧'} 用户 {user_id}: 计数 {stored}，实际 {actual}")
+            if len(drift) > 20:
+                print(f"... 共 {len(drift)} 个用户计数不一致")
+
+            if check_only:
+                db.session.rollback()
+                if not drift:
+                    print("✅ 未读计数与通知表一致")
+                return not drift
+
+            if drift:
+                # 让这些用户的通知推送连接重新读取未读数
+                bump_data_version(*(user_id for user_id, _, _ in drift), include_global=False)
+            db.session.commit()
+            print(f"✅ 已修复 {len(drift)} 个用户的未读计数")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 未读计数修复失败: {e}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    check_only = '--check' in sys.argv
+    if not check_only:
+        print("🚀 开始修复未读通知计数...")
+
+    if reconcile(check_only):
+        print("🎉 完成！")
+    else:
+        print("💥 未读计数与通知表不一致！")
+        sys.exit(1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+通知保留清理脚本
+按 NOTIFICATION_RETENTION_* 配置的保留策略立即清理所有用户的通知（与后台清理线程相同），
+适合在关闭后台线程（NOTIFICATION_RETENTION_INTERVAL=0）时由 cron 调用
+用法: python scripts/sweep_notifications.py
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import app, db, sweep_notifications
+
+POLICY_NAMES = {
+    'read_expired': '已读过期',
+    'age_cap': '超过最长保留天数',
+    'over_limit': '超出每人保留上限',
+}
+
+def sweep():
+    """执行一次清理并输出各策略删除的条数"""
+    with app.app_context():
+        try:
+            db.create_all()
+            config = app.config
+            print(f"🔧 保留策略: 已读 {config['NOTIFICATION_RETENTION_READ_HOURS']} 小时，"
+                  f"最长 {config['NOTIFICATION_RETENTION_MAX_AGE_DAYS']} 天，"
+                  f"每人最多 {config['NOTIFICATION_RETENTION_MAX_PER_USER']} 条（0 表示不限）")
+            deleted = sweep_notifications()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 通知清理失败: {e}")
+            return False
+
+    for policy, count in deleted.items():
+        print(f"✅ {POLICY_NAMES[policy]}: 删除 {count} 条")
+    print(f"🧹 共删除 {sum(deleted.values())} 条通知")
+    return True
+
+if __name__ == "__main__":
+    print("🚀 开始清理通知...")
+    if sweep():
+        print("🎉 完成！")
+    else:
+        print("💥 通知清理失败！")
+        sys.exit(1)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 数据库升级脚本
-添加 read_at 字段到 notification 表
+添加 read_at 字段到 notification 表，创建缺失的表，按报销明细重建日汇总，按通知表修复未读计数（可重复执行）
 """
 import sys
 import os
@@ -10,7 +10,8 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from app.main import app, db
+from app.main import (app, db, bump_data_version, bump_all_data_versions, normalize_expense_amounts,
+                      rebuild_expense_rollup, reconcile_unread_counts)
 from datetime import datetime
 
 def upgrade_database():
@@ -37,6 +38,30 @@ def upgrade_database():
             db.create_all()
             print("✅ 数据库检查完成！")
             
+            # 旧版单条标记已读时没有记录 read_at，这些通知永远不会被清理；补上当前时间，按保留期正常清理
+            result = db.session.execute(db.text(
+                'UPDATE notification SET read_at = :now WHERE is_read = 1 AND read_at IS NULL'
+            ), {'now': datetime.utcnow()})
+            db.session.commit()
+            if result.rowcount:
+                print(f"✅ 已为 {result.rowcount} 条已读通知补充 read_at")
+            
+            # 统计接口只读日汇总表：新建的空表必须按明细重建，否则统计全为0，且审批旧报销时只计入不移出
+            print("🔧 正在重建 expense_daily_rollup 日汇总...")
+            normalize_expense_amounts()
+            count = rebuild_expense_rollup()
+            bump_all_data_versions()
+            db.session.commit()
+            print(f"✅ 已生成 {count} 行日汇总")
+            
+            # 未读数只读 notification_counter：新建的空表按通知表补齐，否则角标全为0、已读扣减被跳过
+            print("🔧 正在核对未读通知计数...")
+            drift = reconcile_unread_counts()
+            if drift:
+                bump_data_version(*(user_id for user_id, _, _ in drift), include_global=False)
+            db.session.commit()
+            print(f"✅ 已修复 {len(drift)} 个用户的未读计数")
+            
         except Exception as e:
             print(f"❌ 数据库升级失败: {e}")
             return False
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+数据库索引升级脚本
+为已有数据库补建 Expense / Notification / ExpenseFile 模型上声明的索引（可重复执行）
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.main import app, db, Expense, Notification, ExpenseFile
+
+INDEXED_MODELS = (Expense, Notification, ExpenseFile)
+
+def upgrade_indexes():
+    """创建缺失的索引并刷新查询规划器统计信息"""
+    with app.app_context():
+        try:
+            # 确保所有表都存在
+            db.create_all()
+
+            inspector = db.inspect(db.engine)
+            for model in INDEXED_MODELS:
+                table = model.__table__
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    if index.name in existing:
+                        print(f"✅ {table.name}.{index.name} 已存在")
+                        continue
+
+                    print(f"🔧 正在创建索引 {table.name}.{index.name} ...")
+                    index.create(db.engine, checkfirst=True)
+                    print(f"✅ {index.name} 创建成功！")
+
+            # 更新统计信息，让SQLite规划器选择新索引
+            with db.engine.begin() as conn:
+                conn.execute(db.text('ANALYZE'))
+            print("✅ 统计信息已更新")
+
+        except Exception as e:
+            print(f"❌ 索引升级失败: {e}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    print("🚀 开始索引升级...")
+    if upgrade_indexes():
+        print("🎉 索引升级完成！")
+    else:
+        print("💥 索引升级失败！")
+        sys.exit(1)